@@ -1,10 +1,16 @@
 from typing import Annotated
+from uuid import UUID
 
-from fastapi import Depends
-from sqlalchemy.orm import Session
+from fastapi import Depends, Request
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy.exc import SQLAlchemyError
 
-from app.core.db import SessionLocal
-from app.core.security import Authenticator
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, DBSession, SessionLocal
+from app.core.replicas import READ_METHODS, Replica, replicas
+from app.core.security import Authenticator, decode_token
+from app.exceptions import AuthenticationError
 
 
 def get_db():
@@ -15,5 +21,94 @@ def get_db():
         db.close()
 
 
-SessionDep = Annotated[Session, Depends(get_db)]
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _bearer_user(request: Request) -> UUID | None:
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() == "bearer":
+        try:
+            return decode_token(token)
+        except AuthenticationError:
+            pass  # the route's own auth dependency rejects it
+    return None
+
+
+async def read_replica(request: Request) -> Replica | None:
+    """Picks the replica for a read-only route, None for the primary.
+    Async so it runs on the event loop: replicas.route and token_cache aren't thread-safe"""
+    user_id = _bearer_user(request)
+    return replicas.route(room_id=request.path_params.get("room_id"), user_id=user_id)
+
+
+ReplicaDep = Annotated[Replica | None, Depends(read_replica)]
+
+
+def get_read_db(replica: ReplicaDep):
+    """Session for read-only routes, on a replica when one is fit.
+    The connection is checked out up front so a dead replica falls back to the primary"""
+    db = SessionLocal() if replica is None else replica.sessions()
+    if replica is not None:
+        try:
+            db.connection()
+        except SQLAlchemyError as e:
+            db.close()
+            replicas.mark_failed(replica, e)
+            db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(replica: ReplicaDep):
+    if replica is not None:
+        db = replica.async_sessions()
+        try:
+            await db.connection()
+        except SQLAlchemyError as e:
+            await db.close()
+            replicas.mark_failed(replica, e)
+        else:
+            async with db:
+                yield db
+            return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def note_room_write(request: Request) -> None:
+    """Router dependency: reads of a room stay on the primary for a while after it's written"""
+    room_id = request.path_params.get("room_id")
+    if room_id is not None and request.method not in READ_METHODS:
+        replicas.note_write("room", room_id)
+
+
+def admit(route_class: str, form_field: str | None = None):
+    """Route dependency for endpoints that hash a password: rate limits the client IP
+    and user for `route_class` in RATE_LIMITS, then holds a concurrency slot.
+    With `form_field`, requests that don't send it pass freely, they authenticate
+    another way (a room token) and never reach the hash"""
+
+    async def admission_slot(request: Request):
+        if form_field is not None and (await request.form()).get(form_field) is None:
+            yield
+            return
+        ip = request.client.host if request.client else None
+        admission.check_rate(route_class, ip, _bearer_user(request))
+        admission.enter(route_class)
+        try:
+            yield
+        finally:
+            admission.leave()
+
+    return Depends(admission_slot)
+
+
+SessionDep = Annotated[DBSession, Depends(get_async_db if settings.DB_ASYNC else get_db)]
+ReadSessionDep = Annotated[
+    DBSession, Depends(get_async_read_db if settings.DB_ASYNC else get_read_db)
+]
 AuthDep = Annotated[Authenticator, Depends()]
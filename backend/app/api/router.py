@@ -1,17 +1,29 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from app.core.metrics import MetricsRoute, render
 
 from .routes.auth import router as auth
 from .routes.items import router as items
+from .routes.monitor import router as monitor
 from .routes.rooms import router as rooms
+from .routes.search import router as search
 from .routes.user import router as user
 
-router = APIRouter()
+router = APIRouter(route_class=MetricsRoute)
 router.include_router(auth)
 router.include_router(user)
 router.include_router(rooms)
 router.include_router(items)
+router.include_router(search)
+router.include_router(monitor)
 
 
 @router.get("/health", tags=["monitor"])
 async def health_check():
     return {"status": "healthy"}
+
+
+@router.get("/metrics", tags=["monitor"], include_in_schema=False)
+async def metrics():
+    body, content_type = render()
+    return Response(body, media_type=content_type)
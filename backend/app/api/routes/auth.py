@@ -3,15 +3,22 @@ from typing import Annotated
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.api.dependencies import AuthDep, SessionDep
+from app.api.dependencies import AuthDep, SessionDep, admit
+from app.core.metrics import MetricsRoute
+from app.exceptions import DBError
 from app.schemas import GeneratedID, Token
 from app.services import user
 from app.services.rooms import generate_room_id
 
-router = APIRouter(tags=["auth"])
+router = APIRouter(tags=["auth"], route_class=MetricsRoute)
 
 
-@router.post("/token", response_model=Token, response_description="JWT access token")
+@router.post(
+    "/token",
+    response_model=Token,
+    response_description="JWT access token",
+    dependencies=[admit("login")],
+)
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     auth: AuthDep,
@@ -25,7 +32,9 @@ async def login(
 
 
 @router.get("/room_id", response_model=GeneratedID, response_description="Generated Room ID")
-async def generate_id():
-    result = generate_room_id()
+async def generate_id(db: SessionDep):
+    result = await generate_room_id(db)
+    if not result.success:
+        raise DBError(detail=result.detail)
     id = result.data
     return GeneratedID(id=id)
@@ -1,13 +1,35 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Depends, Header, Response
 
-from app.api.dependencies import SessionDep
-from app.exceptions import DBError, DuplicateDataError, NotFoundError
-from app.schemas import Item
+from app.api.dependencies import ReadSessionDep, SessionDep, note_room_write
+from app.core.config import settings
+from app.core.etag import etag_matches, expected_version, make_etag
+from app.core.metrics import MetricsRoute
+from app.exceptions import (
+    ConflictError,
+    DBError,
+    DuplicateDataError,
+    NotFoundError,
+    PreconditionFailedError,
+    RequestTooLargeError,
+)
+from app.schemas import (
+    Item,
+    ItemBatch,
+    ItemBatchResult,
+    ItemVersion,
+    JSONPatchOperation,
+    Result,
+)
 from app.services import items as service
 
-router = APIRouter(prefix="/room", tags=["items"])
+router = APIRouter(
+    prefix="/room",
+    tags=["items"],
+    route_class=MetricsRoute,
+    dependencies=[Depends(note_room_write)],
+)
 
 
 @router.post("/{room_id}/item/create", status_code=201)
@@ -28,18 +50,43 @@ async def create_item(
     raise DuplicateDataError
 
 
+@router.post("/{room_id}/items", response_model=ItemBatchResult)
+async def apply_item_batch(
+    room_id: str,
+    db: SessionDep,
+    batch: ItemBatch,
+):
+    if len(batch.operations) > settings.ITEM_BATCH_MAX:
+        raise RequestTooLargeError(detail=f"at most {settings.ITEM_BATCH_MAX} operations per batch")
+    result = await service.apply_batch(
+        room_id=room_id,
+        operations=batch.operations,
+        db=db,
+    )
+    if result:
+        return result
+    raise DBError
+
+
 @router.get("/{room_id}/item/{item_id}", response_model=Item)
 async def view_existing_item(
     room_id: str,
     item_id: int,
-    db: SessionDep,
+    db: ReadSessionDep,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
+    if if_none_match is not None:
+        etag = make_etag(await service.view_item_version(room_id=room_id, item_id=item_id, db=db))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
     result = await service.view_existing_item(
         room_id=room_id,
         item_id=item_id,
         db=db,
     )
     if result:
+        response.headers["ETag"] = make_etag(result.version)
         return result
     raise NotFoundError
 
@@ -49,8 +96,10 @@ async def edit_item(
     room_id: str,
     item_id: int,
     db: SessionDep,
+    response: Response,
     title: Annotated[str, Body(...)],
     content_json: Annotated[list, Body(...)],
+    if_match: Annotated[str | None, Header()] = None,
 ):
     result = await service.edit_item(
         room_id=room_id,
@@ -58,10 +107,36 @@ async def edit_item(
         title=title,
         content_json=content_json,
         db=db,
+        expected_version=expected_version(if_match),
     )
-    if result:
-        return result
-    raise NotFoundError
+    if result.success and result.data is not None:
+        response.headers["ETag"] = make_etag(result.data.version)
+        return result.data
+    _raise_write_error(result)
+
+
+@router.patch("/{room_id}/item/{item_id}", response_model=ItemVersion)
+async def patch_item(
+    room_id: str,
+    item_id: int,
+    db: SessionDep,
+    response: Response,
+    operations: Annotated[list[JSONPatchOperation], Body(...)],
+    if_match: Annotated[str | None, Header()] = None,
+):
+    if len(operations) > settings.ITEM_PATCH_MAX:
+        raise RequestTooLargeError(detail=f"at most {settings.ITEM_PATCH_MAX} patch operations")
+    result = await service.patch_existing_item(
+        room_id=room_id,
+        item_id=item_id,
+        operations=operations,
+        db=db,
+        expected_version=expected_version(if_match),
+    )
+    if result.success and result.data is not None:
+        response.headers["ETag"] = make_etag(result.data.version)
+        return result.data
+    _raise_write_error(result)
 
 
 @router.delete("/{room_id}/item/{item_id}", status_code=200)
@@ -69,12 +144,24 @@ async def delete_item(
     room_id: str,
     item_id: int,
     db: SessionDep,
+    if_match: Annotated[str | None, Header()] = None,
 ):
     result = await service.delete_item(
         room_id=room_id,
         item_id=item_id,
         db=db,
+        expected_version=expected_version(if_match),
     )
     if result.success:
         return
+    _raise_write_error(result)
+
+
+def _raise_write_error(result: Result):
+    if result.status_code == 404:
+        raise NotFoundError(detail=result.detail)
+    if result.status_code == 409:
+        raise ConflictError(detail=result.detail)
+    if result.status_code == 412:
+        raise PreconditionFailedError(detail=result.detail)
     raise DBError
@@ -0,0 +1,41 @@
+from fastapi import APIRouter
+
+from app.core.admission import admission
+from app.core.cache import room_cache, token_cache, username_cache
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.hasher import hasher
+from app.core.metrics import MetricsRoute
+from app.core.replicas import replicas
+
+router = APIRouter(prefix="/monitor", tags=["monitor"], route_class=MetricsRoute)
+
+
+@router.get("/hashing", response_description="Argon2 worker pool queue depth and latency")
+async def hashing_stats():
+    return hasher.stats()
+
+
+@router.get("/admission", response_description="rate limit and concurrency cap rejections")
+async def admission_stats():
+    return admission.stats()
+
+
+@router.get("/cache", response_description="cache sizes, hits, misses and evictions")
+async def cache_stats():
+    return {
+        "rooms": room_cache.stats(),
+        "tokens": token_cache.stats(),
+        "usernames": username_cache.stats(),
+    }
+
+
+@router.get("/db-pool", response_description="connection pool usage and checkout wait times")
+async def db_pool_stats():
+    pool = async_engine.pool if settings.DB_ASYNC else engine.pool
+    return {"engine": "async" if settings.DB_ASYNC else "sync", **pool.stats()}  # type: ignore
+
+
+@router.get("/db-replicas", response_description="read replica health, lag and routed reads")
+async def db_replica_stats():
+    return replicas.stats()
@@ -1,19 +1,34 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Body, Depends, Form
+from fastapi import APIRouter, Body, Depends, Form, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
-from app.api.dependencies import AuthDep, SessionDep
+from app.api.dependencies import (
+    AuthDep,
+    ReadSessionDep,
+    SessionDep,
+    admit,
+    note_room_write,
+)
 from app.constants import NameStringMetadata, PWStringMetadata, RoomIDMetadata, RoomPINMetadata
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag
+from app.core.metrics import MetricsRoute
 from app.core.security import get_current_user
 from app.exceptions import DBError, DuplicateDataError
-from app.schemas import ItemsList
+from app.schemas import ItemFields, ItemsList, ItemSummaryList, RoomToken
 from app.services import rooms as service
 
-router = APIRouter(prefix="/room", tags=["room"])
+router = APIRouter(
+    prefix="/room",
+    tags=["room"],
+    route_class=MetricsRoute,
+    dependencies=[Depends(note_room_write)],
+)
 
 
-@router.post("/create", status_code=201)
+@router.post("/create", status_code=201, dependencies=[admit("password")])
 async def create_room(
     user_id: Annotated[UUID, Depends(get_current_user)],
     room_id: Annotated[str, Form(...), RoomIDMetadata],
@@ -38,48 +53,105 @@ async def create_room(
         raise DBError
 
 
-@router.post("/{room_id}", status_code=200)
+@router.post(
+    "/{room_id}",
+    status_code=200,
+    response_model=RoomToken,
+    dependencies=[admit("password", form_field="room_pw")],
+)
 async def join_room(
     user_id: Annotated[UUID, Depends(get_current_user)],
     room_id: str,
-    room_pw: Annotated[str, Form(...), RoomPINMetadata],
     db: SessionDep,
     auth: AuthDep,
+    room_pw: Annotated[str | None, Form(), RoomPINMetadata] = None,
+    room_token: Annotated[str | None, Header(alias="X-Room-Token")] = None,
 ):
     result = await service.join_room(
         user_id=user_id,
         room_id=room_id,
         room_pw=room_pw,
+        room_token=room_token,
         db=db,
         auth=auth,
     )
     if result.success:
-        return
+        return RoomToken(room_token=result.data)
     if result.status_code == 500:
         raise DBError
 
 
-@router.get("/{room_id}", response_model=ItemsList, response_description="list of items in room")
+@router.get(
+    "/{room_id}",
+    response_model=ItemsList | ItemSummaryList,
+    response_description="list of items in room",
+)
 async def get_room_contents(
     _: Annotated[UUID, Depends(get_current_user)],
     room_id: str,
-    db: SessionDep,
+    db: ReadSessionDep,
+    response: Response,
+    after: Annotated[int | None, Query()] = None,
+    # no limit returns the whole room, clients that don't follow next_cursor rely on it
+    limit: Annotated[int | None, Query(ge=1, le=settings.ROOM_PAGE_SIZE_MAX)] = None,
+    fields: Annotated[ItemFields, Query()] = "full",
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
-    result = await service.get_room_contents(room_id=room_id, db=db)
+    version = await service.get_room_version(room_id=room_id, db=db)
+    etag = make_etag(version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    result = await service.get_room_contents(
+        room_id=room_id,
+        db=db,
+        version=version,
+        after=after,
+        limit=limit,
+        fields=fields,
+    )
+    response.headers["ETag"] = etag
     return result
 
 
-@router.delete("/{room_id}", status_code=200)
-async def delete_room(
+@router.get("/{room_id}/stream", response_description="items in room as NDJSON, one per line")
+async def stream_room_contents(
     _: Annotated[UUID, Depends(get_current_user)],
     room_id: str,
-    room_pw: Annotated[str, Form(...), RoomPINMetadata],
+    db: SessionDep,
+):
+    lines = service.stream_room_contents(room_id=room_id, db=db)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@router.get("/{room_id}/events", response_description="room changes as Server-Sent Events")
+async def room_events(
+    _: Annotated[UUID, Depends(get_current_user)],
+    room_id: str,
+):
+    events = service.room_events(room_id=room_id)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete(
+    "/{room_id}", status_code=200, dependencies=[admit("password", form_field="room_pw")]
+)
+async def delete_room(
+    user_id: Annotated[UUID, Depends(get_current_user)],
+    room_id: str,
     db: SessionDep,
     auth: AuthDep,
+    room_pw: Annotated[str | None, Form(), RoomPINMetadata] = None,
+    room_token: Annotated[str | None, Header(alias="X-Room-Token")] = None,
 ):
     result = await service.delete_room(
+        user_id=user_id,
         room_id=room_id,
         room_pw=room_pw,
+        room_token=room_token,
         db=db,
         auth=auth,
     )
@@ -88,7 +160,7 @@ async def delete_room(
     raise DBError
 
 
-@router.delete("/{room_id}/{username}", status_code=200)
+@router.delete("/{room_id}/{username}", status_code=200, dependencies=[admit("password")])
 async def leave_room(
     user_id: Annotated[UUID, Depends(get_current_user)],
     username: str,
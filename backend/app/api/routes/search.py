@@ -0,0 +1,33 @@
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query
+
+from app.api.dependencies import SessionDep
+from app.core.config import settings
+from app.core.metrics import MetricsRoute
+from app.core.security import get_current_user
+from app.schemas import SearchResults
+from app.services import items as service
+
+router = APIRouter(prefix="/search", tags=["search"], route_class=MetricsRoute)
+
+
+@router.get("", response_model=SearchResults, response_description="ranked items with snippets")
+async def search_items(
+    user_id: Annotated[UUID, Depends(get_current_user)],
+    db: SessionDep,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=settings.SEARCH_PAGE_SIZE_MAX)] = (
+        settings.SEARCH_PAGE_SIZE
+    ),
+    offset: Annotated[int, Query(ge=0, le=settings.SEARCH_OFFSET_MAX)] = 0,
+):
+    result = await service.search_items(
+        user_id=user_id,
+        query=q,
+        db=db,
+        limit=limit,
+        offset=offset,
+    )
+    return result
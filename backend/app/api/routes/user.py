@@ -3,17 +3,18 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Form
 
-from app.api.dependencies import AuthDep, SessionDep
+from app.api.dependencies import AuthDep, ReadSessionDep, SessionDep, admit
 from app.constants import NameStringMetadata, PWStringMetadata
+from app.core.metrics import MetricsRoute
 from app.core.security import get_current_user
 from app.exceptions import DBError, DuplicateDataError
 from app.schemas import RoomsList
 from app.services import user as service
 
-router = APIRouter(prefix="/user", tags=["user"])
+router = APIRouter(prefix="/user", tags=["user"], route_class=MetricsRoute)
 
 
-@router.post("/create", status_code=201)
+@router.post("/create", status_code=201, dependencies=[admit("login")])
 async def create_user(
     username: Annotated[str, Form(...), NameStringMetadata],
     password: Annotated[str, Form(...), PWStringMetadata],
@@ -35,7 +36,7 @@ async def create_user(
 async def user_home(
     username: str,
     user_id: Annotated[UUID, Depends(get_current_user)],
-    db: SessionDep,
+    db: ReadSessionDep,
 ):
     rooms = await service.get_user_home(
         user_id=user_id,
@@ -45,7 +46,7 @@ async def user_home(
     return rooms
 
 
-@router.delete("/{username}", status_code=200)
+@router.delete("/{username}", status_code=200, dependencies=[admit("password")])
 async def delete_user(
     user_id: Annotated[UUID, Depends(get_current_user)],
     password: Annotated[str, Form(...)],
@@ -0,0 +1,118 @@
+"""Admission control for the endpoints that run Argon2.
+
+Each route class has token buckets per client IP and per user, and hash-bearing
+requests beyond a concurrency cap are turned away before they reach the DB or the
+hash pool. Rejections answer at once with 429 (over a rate) or 503 (over the cap)
+and a Retry-After. State is per worker, so with N workers a client gets up to N
+times the configured rates"""
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from app.core.config import settings
+from app.core.hasher import hasher
+from app.core.metrics import ADMISSION_REJECTED
+from app.exceptions import ServiceUnavailableError, TooManyRequestsError
+
+
+class TokenBuckets:
+    """One bucket per key, refilled at `rate` tokens per second up to `burst`.
+    The least recently used keys are dropped past `max_keys`, which only forgets their debt"""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def wait(self, key: Hashable) -> float:
+        """:returns: 0 when a token is available, else seconds until there is one"""
+        return max(0.0, (1 - self._tokens(key, time.monotonic())) / self.rate)
+
+    def take(self, key: Hashable) -> None:
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        self._buckets.pop(key, None)
+        self._buckets[key] = (max(0.0, tokens - 1), now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]],
+        max_concurrent: int,
+        enabled: bool = True,
+        max_keys: int = 100_000,
+    ):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.buckets = {
+            route_class: TokenBuckets(rate, burst, max_keys)
+            for route_class, (rate, burst) in limits.items()
+        }
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected: dict[str, int] = {}
+
+    def _reject(self, route_class: str, reason: str) -> None:
+        key = f"{route_class}:{reason}"
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        ADMISSION_REJECTED.labels(route_class, reason).inc()
+
+    def check_rate(self, route_class: str, ip: str | None, user_id: Any = None) -> None:
+        """:raises TooManyRequestsError: when the IP's or the user's bucket is empty"""
+        buckets = self.buckets.get(route_class)
+        if not self.enabled or buckets is None:
+            return
+        keys = [(reason, key) for reason, key in (("ip", ip), ("user", user_id)) if key is not None]
+        # nothing is taken unless every bucket admits, a rejected request costs no tokens
+        for reason, key in keys:
+            wait = buckets.wait((reason, key))
+            if wait:
+                self._reject(route_class, reason)
+                raise TooManyRequestsError(retry_after=math.ceil(wait))
+        for key in keys:
+            buckets.take(key)
+
+    def enter(self, route_class: str) -> None:
+        """Counts a hash-bearing request in; pair with `leave`.
+        :raises ServiceUnavailableError: when `max_concurrent` are already in"""
+        if self.enabled and self.in_flight >= self.max_concurrent:
+            self._reject(route_class, "concurrency")
+            raise ServiceUnavailableError(detail="too many password checks in progress")
+        self.in_flight += 1
+        self.admitted += 1
+
+    def leave(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "tracked_keys": {name: len(b) for name, b in self.buckets.items()},
+        }
+
+
+admission = AdmissionController(
+    limits=settings.RATE_LIMITS,
+    # a request past this would only wait in the hash pool's queue
+    max_concurrent=settings.HASH_CONCURRENCY_MAX or 2 * hasher.workers,
+    enabled=settings.RATE_LIMITS_ENABLED,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS,
+)
@@ -0,0 +1,163 @@
+"""In-process cache for room reads, bounded by entry age and total size.
+Writes invalidate a whole room, locally right away and on other workers through
+the room event feed"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.events import hub
+
+
+class RoomCache:
+    """LRU over (room_id, ...) keys holding Pydantic models.
+
+    Each room has a generation that every invalidation bumps. Loaders read it before
+    going to the DB and pass it to `put`, so a read that raced a write is never stored"""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[tuple, tuple[float, int, BaseModel]] = OrderedDict()
+        self._room_keys: dict[str, set[tuple]] = {}
+        self._generations: dict[str, int] = {}
+        self._epoch = 0  # bumped by clear()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, room_id: str) -> tuple[int, int]:
+        return self._epoch, self._generations.get(room_id, 0)
+
+    def get(self, room_id: str, *params: Hashable) -> Any:
+        key = (room_id, *params)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(
+        self, room_id: str, *params: Hashable, value: BaseModel, generation: tuple[int, int]
+    ) -> None:
+        if generation != self.generation(room_id):
+            return
+        size = len(value.__pydantic_serializer__.to_json(value))
+        if size > self.max_bytes:
+            return
+        key = (room_id, *params)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._room_keys.setdefault(room_id, set()).add(key)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, room_id: str) -> None:
+        self._generations[room_id] = self._generations.get(room_id, 0) + 1
+        for key in self._room_keys.pop(room_id, ()):
+            self._drop(key)
+        self.invalidations += 1
+
+    def on_event(self, payload: dict[str, Any]) -> None:
+        """Room event feed callback, covers writes made by other workers"""
+        if payload["room_id"] is None:  # the feed lost events, anything may be stale
+            self.clear()
+        else:
+            self.invalidate(payload["room_id"])
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._generations.clear()
+        for key in list(self._entries):
+            self._drop(key)
+        self.invalidations += 1
+
+    def _drop(self, key: tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+        keys = self._room_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._room_keys[key[0]]
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class ExpiringCache:
+    """Small LRU whose entries each expire at their own wall clock time"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+room_cache = RoomCache(max_bytes=settings.ROOM_CACHE_MAX_BYTES, ttl=settings.ROOM_CACHE_TTL)
+hub.add_callback(room_cache.on_event)
+
+# access token -> user ID, kept until the token expires
+token_cache = ExpiringCache(max_entries=settings.TOKEN_CACHE_SIZE)
+# user ID -> username, dropped on user deletion
+username_cache = ExpiringCache(max_entries=settings.USERNAME_CACHE_SIZE)
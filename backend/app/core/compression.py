@@ -0,0 +1,71 @@
+"""Negotiated response compression.
+Brotli is preferred when the client accepts it and the `brotli` package is installed,
+gzip otherwise. Bodies under `minimum_size` bytes and event streams are sent as is"""
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional, gzip covers every client anyway
+    brotli = None
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Codings the client accepts, skipping any sent with q=0"""
+    codings = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) == 0:
+                continue
+        except ValueError:
+            continue
+        if coding:
+            codings.add(coding.strip().lower())
+    return codings
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)  # type: ignore
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        body = self.compressor.process(body)
+        if more_body:
+            return body + self.compressor.flush()
+        return body + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codings = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        responder: IdentityResponder
+        if brotli is not None and "br" in codings:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in codings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import PostgresDsn, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,17 +18,87 @@ class Settings(BaseSettings):
     jwt_secret_key: str = ""
     jwt_algorithm: str = "HS256"
     jwt_exp_time: int = 15
+    room_token_exp_time: int = 10
+
+    # Argon2 runs in a worker pool; callers beyond workers + queue size get a 503
+    HASH_POOL_KIND: Literal["thread", "process"] = "thread"
+    HASH_POOL_WORKERS: int | None = None  # None = one per CPU core
+    HASH_QUEUE_SIZE: int = 64
+    # admission control on those endpoints, per worker: over a rate -> 429, over the cap -> 503
+    RATE_LIMITS_ENABLED: bool = True
+    # route class -> (requests per second, burst), for each client IP and each user
+    RATE_LIMITS: dict[str, tuple[float, int]] = {"login": (0.5, 10), "password": (1.0, 20)}
+    RATE_LIMIT_MAX_KEYS: int = 100_000  # IPs/users remembered per route class
+    HASH_CONCURRENCY_MAX: int | None = None  # None = two per hash pool worker
 
-    POSTGRES_SERVER: str
+    # "sqlite" runs on a single local file instead, for single-node installs (`sqlite` extra)
+    DB_BACKEND: Literal["postgres", "sqlite"] = "postgres"
+    POSTGRES_SERVER: str = ""
     POSTGRES_PORT: int = 5432
-    POSTGRES_USER: str
+    POSTGRES_USER: str = ""
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    DB_ASYNC: bool = False
+    # "check" only compares the stored schema version, "migrate" creates or upgrades the schema
+    DB_STARTUP: Literal["check", "migrate"] = "check"
+    DB_POOL_SIZE: int = 10  # per worker, and per engine
+    DB_MAX_OVERFLOW: int = 10  # extra connections opened under bursts, closed when returned
+    DB_POOL_TIMEOUT: float = 10  # seconds a checkout waits before failing
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced, -1 keeps them
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout, survives Postgres restarts
+    DB_POOL_WARM: int = 4  # connections opened at startup, before the first request
+    DB_PROFILE: bool = False  # per-request query counts, slow query and N+1 logging
+    DB_SLOW_QUERY_MS: float = 100
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # runs of one statement per request before warning
+    # read replicas (JSON list of URIs) for GET /room/{room_id}, /user/{username} and item GETs
+    DB_REPLICA_URIS: list[str] = []
+    DB_REPLICA_MAX_LAG: float = 2  # seconds behind the primary before a replica is skipped
+    DB_REPLICA_STICKY: float = 5  # seconds a written room or user reads the primary, > MAX_LAG
+    DB_REPLICA_RETRY: float = 30  # seconds a failed replica is left out
+    DB_REPLICA_CHECK_INTERVAL: float = 5  # seconds between replica lag checks
+    SQLITE_PATH: str = "ournote.db"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes of the file read through mmap
+    SQLITE_CACHE_SIZE: int = 64 * 1024  # KiB of page cache per connection
+    SQLITE_BUSY_TIMEOUT: int = 5000  # ms a connection waits on another process's write
+
+    ROOM_ID_RESERVATION_TTL: int = 600  # seconds a generated room ID stays reserved
+    ROOM_ID_MAX_ATTEMPTS: int = 5
+
+    ROOM_PAGE_SIZE_MAX: int = 1000
+    ROOM_STREAM_BATCH: int = 500  # rows per server-side cursor fetch
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_PAGE_SIZE_MAX: int = 100
+    SEARCH_OFFSET_MAX: int = 1000  # ranked results page by offset, keep deep pages bounded
+    ITEM_BATCH_MAX: int = 500  # operations per bulk item request
+    ITEM_PATCH_MAX: int = 100  # operations per JSON Patch document
+
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes, smaller responses aren't worth the CPU
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    ROOM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # serialized size of cached room reads
+    ROOM_CACHE_TTL: int = 30  # seconds, bounds staleness if a worker misses a NOTIFY
+    TOKEN_CACHE_SIZE: int = 10_000  # verified access tokens
+    USERNAME_CACHE_SIZE: int = 10_000
+    USERNAME_CACHE_TTL: int = 300  # seconds, stale on workers that didn't see the deletion
+
+    LOG_DIR: str = "logs"
+    LOG_FILE: str = "app.log"
+    LOG_LEVEL: str = "INFO"
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024  # rotate the log file at this size
+    LOG_BACKUP_COUNT: int = 5
+    # route template -> fraction of successful requests logged, errors are always logged
+    ACCESS_LOG_SAMPLE_RATES: dict[str, float] = {"/health": 0.01, "/metrics": 0.01}
+
+    EVENTS_KEEPALIVE: int = 15  # seconds between SSE keepalive comments
+    EVENTS_QUEUE_SIZE: int = 256  # buffered events per subscriber before it's told to resync
 
     @computed_field
     @property
-    def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
-        return PostgresDsn.build(
+    def SQLALCHEMY_DATABASE_URI(self) -> str:
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite:///{self.SQLITE_PATH}"
+        dsn = PostgresDsn.build(
             scheme="postgresql+psycopg",
             username=self.POSTGRES_USER,
             password=self.POSTGRES_PASSWORD,
@@ -34,6 +106,7 @@ class Settings(BaseSettings):
             port=self.POSTGRES_PORT,
             path=self.POSTGRES_DB,
         )
+        return str(dsn)
 
 
 settings = Settings()  # type: ignore
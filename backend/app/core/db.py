@@ -1,13 +1,113 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
 from sqlite3 import Connection as SQLite3Connection
+from typing import Any
 
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.dialects.sqlite.aiosqlite import AsyncAdapt_aiosqlite_connection
+from sqlalchemy.engine import Engine, Row, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+from app.core import profiler
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_LATENCY, statement_labels
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=settings.dev)
+
+class PoolStatsMixin:
+    """Records how long checkouts wait for a connection and how many give up"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),  # type: ignore
+            "max_overflow": self._max_overflow,  # type: ignore
+            "in_use": self.checkedout(),  # type: ignore
+            "idle": self.checkedin(),  # type: ignore
+            "overflow": max(0, self.overflow()),  # type: ignore
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.wait_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
+class InstrumentedQueuePool(PoolStatsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncPool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+
+def create_engines(uri: str) -> tuple[Engine, AsyncEngine]:
+    """Sync and async engine for one database, both on instrumented pools.
+    psycopg 3 serves both paths, so the same URI works for the async engine.
+    SQLite goes through aiosqlite instead"""
+    async_url = make_url(uri)
+    if async_url.get_backend_name() == "sqlite":
+        async_url = async_url.set(drivername="sqlite+aiosqlite")
+    sync_engine = create_engine(
+        uri,
+        echo=settings.dev,
+        poolclass=InstrumentedQueuePool,
+        **pool_options,
+    )
+    async_engine = create_async_engine(
+        async_url,
+        echo=settings.dev,
+        poolclass=InstrumentedAsyncPool,
+        **pool_options,
+    )
+    return sync_engine, async_engine
+
+
+engine, async_engine = create_engines(settings.SQLALCHEMY_DATABASE_URI)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+DBSession = Session | AsyncSession
+
+# SQLite allows one writer at a time. Async sessions queue here before their first write
+# instead of spinning in SQLite's busy handler; sync sessions never yield mid-transaction,
+# so the event loop already serialises them
+_sqlite_writer = asyncio.Lock()
 
 
 class Base(DeclarativeBase):
@@ -15,23 +115,131 @@ class Base(DeclarativeBase):
 
 
 def init_db(**kwargs):
-    if "engine" in kwargs.keys():
-        Base.metadata.create_all(bind=kwargs["engine"])
-    Base.metadata.create_all(bind=engine)
+    """Create a new database or apply pending migrations, see app.migrations"""
+    from app.migrations import migrate
+
+    migrate(kwargs.get("engine", engine))
+
+
+def check_db(**kwargs):
+    """Fail fast unless the database was already migrated to this build's schema"""
+    from app.migrations import check
+
+    check(kwargs.get("engine", engine))
+
+
+def warm_pool(connections: int) -> None:
+    """Open connections ahead of the first requests, they go back to the pool idle"""
+    opened = [engine.connect() for _ in range(connections)]
+    for conn in opened:
+        conn.close()
+
+
+async def warm_async_pool(connections: int) -> None:
+    opened = await asyncio.gather(*(async_engine.connect().start() for _ in range(connections)))
+    for conn in opened:
+        await conn.close()
+
+
+def dialect_name(db: DBSession) -> str:
+    """:returns: "postgresql" or "sqlite" """
+    bind = db.bind if db.bind is not None else engine
+    return bind.dialect.name
+
+
+async def queue_for_write(db: DBSession) -> None:
+    """Holds the SQLite write lock until the session's transaction ends.
+    Writes take it on their own; call it first to make a read-modify-write atomic"""
+    if not isinstance(db, AsyncSession):
+        return
+    if not db.info.get("sqlite_writer") and dialect_name(db) == "sqlite":
+        await _sqlite_writer.acquire()
+        db.info["sqlite_writer"] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_writer(session: Session, transaction) -> None:
+    if transaction.parent is None and session.info.pop("sqlite_writer", False):
+        _sqlite_writer.release()
+
+
+async def execute(db: DBSession, stmt: Any, params: Any = None):
+    """Run a statement on either session type.
+    Sync sessions block the caller, async sessions yield to the event loop"""
+    if isinstance(db, AsyncSession):
+        if getattr(stmt, "is_dml", False):
+            await queue_for_write(db)
+        return await db.execute(stmt, params)
+    return db.execute(stmt, params)
+
+
+async def stream(db: DBSession, stmt: Any, batch_size: int) -> AsyncIterator[Row]:
+    """Yield rows from a server-side cursor, fetching `batch_size` rows at a time"""
+    stmt = stmt.execution_options(yield_per=batch_size)
+    if isinstance(db, AsyncSession):
+        result = await db.stream(stmt)
+        async for row in result:
+            yield row
+    else:
+        for row in db.execute(stmt):
+            yield row
+
+
+async def commit(db: DBSession) -> None:
+    if isinstance(db, AsyncSession):
+        if db.new or db.dirty or db.deleted:  # flushed by the commit
+            await queue_for_write(db)
+        await db.commit()
+    else:
+        db.commit()
+
+
+async def rollback(db: DBSession) -> None:
+    if isinstance(db, AsyncSession):
+        await db.rollback()
+    else:
+        db.rollback()
 
 
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
-    """Sets SQLite constraints ON"""
-    if isinstance(dbapi_connection, SQLite3Connection):
+    """Sets SQLite constraints ON, WAL journaling and the cache sizes.
+    WAL lets readers run alongside the writer, and with synchronous=NORMAL
+    commits only fsync at checkpoints; a power loss can drop the last commits, not corrupt"""
+    if isinstance(dbapi_connection, (SQLite3Connection, AsyncAdapt_aiosqlite_connection)):
         # the sqlite3 driver will not set PRAGMA foreign_keys
         # if autocommit=False; set to True temporarily
-        ac = dbapi_connection.autocommit
-        dbapi_connection.autocommit = True
+        ac = getattr(dbapi_connection, "autocommit", None)
+        if ac is not None:
+            dbapi_connection.autocommit = True
 
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT:d}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE:d}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE:d}")  # negative: KiB
+        cursor.execute("PRAGMA temp_store=MEMORY")
         cursor.close()
 
         # restore previous autocommit setting
-        dbapi_connection.autocommit = ac
+        if ac is not None:
+            dbapi_connection.autocommit = ac
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # kept on the statement's own context, a failed statement leaves nothing behind
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    elapsed = time.perf_counter() - context._query_start
+    DB_QUERY_LATENCY.labels(*statement_labels(statement)).observe(elapsed)
+    if settings.DB_PROFILE:
+        profiler.record(statement, parameters, elapsed)
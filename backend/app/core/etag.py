@@ -0,0 +1,27 @@
+"""ETags over the version columns, for conditional requests"""
+
+from app.exceptions import PreconditionFailedError
+
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def expected_version(if_match: str | None) -> int | None:
+    """:returns: version the client expects from If-Match, None when any version will do"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().strip('"'))
+    except ValueError as e:  # not an ETag we issued, so it can't match
+        raise PreconditionFailedError from e
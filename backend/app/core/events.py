@@ -0,0 +1,145 @@
+"""Room change feed.
+Writes are announced with pg_notify inside the write's transaction, and every worker keeps one
+LISTEN connection that fans the notifications out to its local subscribers"""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncGenerator, Callable
+from typing import Any, Literal
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import DBSession, dialect_name, engine, execute
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "room_events"
+PAYLOAD_MAX = 7900  # NOTIFY payloads are capped at 8000 bytes
+
+RoomEvent = Literal["item.created", "item.updated", "item.deleted", "room.deleted"]
+
+
+class RoomEventHub:
+    """Per-room subscriber queues, fed by a single shared listener connection.
+
+    A subscriber that falls `queue_size` events behind gets a "resync" event
+    and is dropped, so one slow client can't hold the listener back"""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._rooms: dict[str, set[asyncio.Queue]] = {}
+        self._callbacks: list[Callable[[dict[str, Any]], None]] = []
+        self._listener: asyncio.Task | None = None
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(queues) for queues in self._rooms.values())
+
+    def add_callback(self, callback: Callable[[dict[str, Any]], None]) -> None:
+        """Call `callback` with every event, from any room and any worker"""
+        self._callbacks.append(callback)
+
+    def start(self) -> None:
+        """Open the listener connection, a no-op when it's running or there's no Postgres"""
+        if _is_postgres() and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def subscribe(self, room_id: str) -> AsyncGenerator[dict[str, Any]]:
+        """Yield events for `room_id` until the subscriber is dropped or disconnects"""
+        self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._rooms.setdefault(room_id, set()).add(queue)
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in ("resync", "room.deleted"):
+                    return
+        finally:
+            queues = self._rooms.get(room_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._rooms[room_id]
+
+    def dispatch(self, payload: dict[str, Any]) -> None:
+        """Hand an event to the callbacks and every local subscriber of its room"""
+        for callback in self._callbacks:
+            callback(payload)
+        for queue in list(self._rooms.get(payload["room_id"], ())):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                queue.get_nowait()
+                queue.put_nowait({"event": "resync", "room_id": payload["room_id"]})
+
+    async def _listen(self) -> None:
+        import psycopg  # only workers on Postgres get here
+
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    async for notify in conn.notifies():
+                        self.dispatch(json.loads(notify.payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("room event listener lost its connection, reconnecting")
+                # whatever was sent while disconnected is gone, tell everyone to refetch
+                self.dispatch({"event": "resync", "room_id": None})
+                for room_id in list(self._rooms):
+                    self.dispatch({"event": "resync", "room_id": room_id})
+                await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+async def publish(
+    db: DBSession,
+    room_id: str,
+    event: RoomEvent,
+    item_ids: list[int] | None = None,
+) -> None:
+    """Announce a change from inside the write's transaction, before it commits.
+    Postgres delivers the NOTIFY only if the transaction commits; without Postgres the
+    event waits on the session and is dispatched locally after the commit"""
+    payload = {"event": event, "room_id": room_id, "item_ids": item_ids}
+    if dialect_name(db) != "postgresql":  # single process, nothing to fan out across
+        db.info.setdefault("room_events", []).append(payload)
+        return
+    message = json.dumps(payload, separators=(",", ":"))
+    if len(message.encode()) > PAYLOAD_MAX:  # large batches, subscribers refetch the room
+        payload["item_ids"] = None
+        message = json.dumps(payload, separators=(",", ":"))
+    await execute(db, select(func.pg_notify(CHANNEL, message)))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session: Session) -> None:
+    for payload in session.info.pop("room_events", ()):
+        hub.dispatch(payload)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_uncommitted(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("room_events", None)
+
+
+hub = RoomEventHub(queue_size=settings.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,125 @@
+"""Argon2 hashing in a bounded worker pool, off the event loop"""
+
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+from pwdlib import PasswordHash
+
+from app.core.config import settings
+from app.core.metrics import HASH_LATENCY, HASH_REJECTED
+from app.exceptions import ServiceUnavailableError
+
+# module level so process pool workers can pickle the calls by reference
+_password_hash = PasswordHash.recommended()
+
+
+def _hash(password: str) -> str:
+    return _password_hash.hash(password)
+
+
+def _verify(password: str, hash: str) -> bool:
+    return _password_hash.verify(password, hash)
+
+
+def _ready() -> bool:
+    return True
+
+
+class HashPool:
+    """Runs Argon2 in a thread or process pool.
+    argon2-cffi releases the GIL, so threads already spread over several cores.
+
+    At most `workers + queue_size` calls are admitted at once;
+    anything beyond that fails fast with ServiceUnavailableError"""
+
+    def __init__(
+        self,
+        kind: Literal["thread", "process"] = "thread",
+        workers: int | None = None,
+        queue_size: int = 64,
+    ):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="argon2"
+                )
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    async def run(self, op: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """:param op: operation label for the latency metric"""
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            HASH_REJECTED.inc()
+            raise ServiceUnavailableError(detail="password hashing queue is full")
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            HASH_LATENCY.labels(op).observe(elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self.run("hash", _hash, password)
+
+    async def verify(self, password: str, hash: str) -> bool:
+        return await self.run("verify", _verify, password, hash)
+
+    async def warm(self) -> None:
+        """Spin the pool up now rather than on the first logins"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, _ready) for _ in range(self.workers))
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+            "calls": self.calls,
+            "avg_latency_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_latency_ms": self.max_seconds * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = HashPool(
+    kind=settings.HASH_POOL_KIND,
+    workers=settings.HASH_POOL_WORKERS,
+    queue_size=settings.HASH_QUEUE_SIZE,
+)
@@ -1,49 +1,131 @@
 """
-Experimenting with logging modules - not implemented yet
+Structured JSON logging.
+Handlers only enqueue records; a QueueListener thread formats and writes them,
+so file I/O never runs on the event loop
 """
 
 import logging
+import queue
+import random
 import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Awaitable, Callable
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
-log_filename = "app.log"
-log_path = log_dir / log_filename
-
-logging.basicConfig(
-    filename=log_path,
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
-logger = logging.getLogger(__name__)
-
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]):
-        # Log request details
-        client_ip = request.client.host  # type: ignore
-        method = request.method
-        url = request.url.path
-
-        start_time = time.perf_counter()
-        logger.info(f"Request: [{start_time}] {method} {url} from {client_ip}")
-
-        # Process the request
-        response = await call_next(request)
-        end_time = time.perf_counter()
-        process_dt = end_time - start_time
-
-        # Log response details
-        status_code = response.status_code
-        logger.info(
-            f"Response: [{end_time}] {method} {url} returned {status_code} to {client_ip} in {process_dt}s"
-        )
-
-        return response
+from typing import Any
+
+import orjson
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+logger = logging.getLogger("app.access")
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id is not None:  # type: ignore
+            data["request_id"] = record.request_id  # type: ignore
+        data.update((k, v) for k, v in record.__dict__.items() if k not in _RESERVED)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return orjson.dumps(data, default=str).decode()
+
+
+class RequestIDFilter(logging.Filter):
+    """Copies the request ID onto records while still in the request's context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+def setup_logging() -> QueueListener:
+    """Route the `app` loggers through a queue to a size-rotated JSON file.
+    Call once at startup, then start the returned listener and stop it on shutdown"""
+    log_dir = Path(settings.LOG_DIR)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        log_dir / settings.LOG_FILE,
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JSONFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIDFilter())
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL)
+    app_logger.handlers = [queue_handler]
+    app_logger.propagate = False
+    return QueueListener(log_queue, file_handler, respect_handler_level=True)
+
+
+class LoggingMiddleware:
+    """One access record per request, tagged with an X-Request-ID (the client's, or a new one).
+    Routes in ACCESS_LOG_SAMPLE_RATES only log that fraction of their successful requests"""
+
+    def __init__(self, app: ASGIApp, sample_rates: dict[str, float] | None = None):
+        self.app = app
+        self.sample_rates = sample_rates or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                rid = value.decode("latin-1")[:64]
+                break
+        rid = rid or uuid.uuid4().hex
+        token = request_id.set(rid)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else scope["path"]
+            rate = self.sample_rates.get(path, 1.0)
+            if status >= 400 or rate >= 1.0 or random.random() < rate:
+                client = scope.get("client")
+                logger.info(
+                    "request",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": path,
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                        "client": client[0] if client else None,
+                        "sample_rate": rate,
+                    },
+                )
+            request_id.reset(token)
@@ -0,0 +1,106 @@
+"""Prometheus metrics. Process, platform and GC collectors come with the default registry.
+
+Route metrics are labelled with the route template, not the raw path, to keep series bounded.
+With several workers set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all of them"""
+
+import os
+import re
+import time
+from functools import lru_cache
+
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from starlette.types import Message, Receive, Scope, Send
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled by route",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by operation and table",
+    ["op", "table"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+DB_READ_ROUTE = Counter(
+    "db_read_route_total",
+    "Read-only requests by the database they were sent to",
+    ["target"],  # replica, primary_sticky (recent write), primary_fallback (no fit replica)
+)
+
+HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds",
+    "Argon2 hash/verify latency, including time queued for a worker",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+HASH_REJECTED = Counter("password_hash_rejected_total", "Argon2 calls rejected by a full queue")
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests to password endpoints turned away before any work",
+    ["route_class", "reason"],  # reason: ip or user (rate limited, 429), concurrency (503)
+)
+
+
+class MetricsRoute(APIRoute):
+    """Counts and times every request a route handles"""
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method, self.path)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await super().handle(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.labels(method, self.path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, self.path, str(status)).inc()
+            in_flight.dec()
+
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(statement: str) -> tuple[str, str]:
+    """Operation and first table of a statement.
+    SQLAlchemy reuses compiled statement strings, so parsing is paid once per statement"""
+    op = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    match = _TABLE.search(statement)
+    return op, match.group(1) if match else ""
+
+
+def render() -> tuple[bytes, str]:
+    """:returns: metrics text and its content type"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,92 @@
+"""Opt-in query profiler, enabled with DB_PROFILE.
+Logs slow statements, counts statements per request and warns about N+1 patterns"""
+
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.db")
+
+PARAMS_MAX = 500  # characters of bound parameters kept in a slow query record
+
+
+@dataclass
+class RequestQueries:
+    scope: Scope
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else self.scope["path"]
+
+
+current: ContextVar[RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+def record(statement: str, parameters: Any, seconds: float) -> None:
+    """Called from the engine's after_cursor_execute hook"""
+    queries = current.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+        queries.statements[statement] += 1
+    if seconds * 1000 >= settings.DB_SLOW_QUERY_MS:
+        logger.warning(
+            "slow query",
+            extra={
+                "statement": statement,
+                "parameters": repr(parameters)[:PARAMS_MAX],
+                "duration_ms": round(seconds * 1000, 3),
+                "route": queries.route if queries is not None else None,
+            },
+        )
+
+
+class QueryProfilerMiddleware:
+    """Adds X-DB-Query-Count and X-DB-Time-Ms to responses.
+    Streaming responses report the queries run before their first chunk"""
+
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = 10):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope=scope)
+        token = current.set(queries)
+
+        async def send_with_counts(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(queries.count)
+                headers["X-DB-Time-Ms"] = f"{queries.seconds * 1000:.3f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_counts)
+        finally:
+            current.reset(token)
+            for statement, times in queries.statements.items():
+                if times >= self.n_plus_one_threshold:
+                    logger.warning(
+                        "same statement repeated in one request, possible N+1",
+                        extra={
+                            "statement": statement,
+                            "times": times,
+                            "route": queries.route,
+                            "method": scope["method"],
+                        },
+                    )
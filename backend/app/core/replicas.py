@@ -0,0 +1,194 @@
+"""Read replica routing for the read-only endpoints.
+
+A read goes to a replica unless the room or user it touches was written in the last
+DB_REPLICA_STICKY seconds (read-your-writes), or no replica is up and within
+DB_REPLICA_MAX_LAG of the primary; then it reads the primary.
+Room writes reach every worker through the room event feed; a user's own writes only
+mark the worker that served them, the lag bound covers the rest"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import ExpiringCache
+from app.core.config import settings
+from app.core.db import create_engines
+from app.core.events import hub
+from app.core.metrics import DB_READ_ROUTE
+
+logger = logging.getLogger("app.db")
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# seconds since the last replayed transaction, 0 when the replica has replayed all it received
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: Engine
+    async_engine: AsyncEngine
+    sessions: sessionmaker
+    async_sessions: async_sessionmaker
+    lag: float = 0.0
+    down_until: float = 0.0
+    reads: int = 0
+    failures: int = 0
+
+    def pool_stats(self) -> dict[str, Any]:
+        pool = self.async_engine.pool if settings.DB_ASYNC else self.engine.pool
+        return pool.stats()  # type: ignore
+
+    def measure_lag(self) -> float:
+        """Blocking, run it off the event loop"""
+        with self.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":  # stand-ins for tests, never behind
+                conn.execute(text("SELECT 1"))
+                return 0.0
+            return float(conn.execute(LAG_QUERY).scalar() or 0.0)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        uris: list[str],
+        max_lag: float = 2,
+        sticky: float = 5,
+        retry: float = 30,
+        check_interval: float = 5,
+    ):
+        self.max_lag = max_lag
+        self.sticky = sticky
+        self.retry = retry
+        self.check_interval = check_interval
+        self.replicas: list[Replica] = []
+        for uri in uris:
+            sync_engine, async_engine = create_engines(uri)
+            self.replicas.append(
+                Replica(
+                    name=sync_engine.url.render_as_string(hide_password=True),
+                    engine=sync_engine,
+                    async_engine=async_engine,
+                    sessions=sessionmaker(autoflush=False, bind=sync_engine),
+                    async_sessions=async_sessionmaker(
+                        bind=async_engine, autoflush=False, expire_on_commit=False
+                    ),
+                )
+            )
+        self._turn = itertools.count()
+        self._written = ExpiringCache(max_entries=100_000)  # ("room"|"user", ID) -> True
+        self._all_written_until = 0.0
+        self._checker: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def note_write(self, *key: Hashable) -> None:
+        self._written.put(key, True, expires_at=time.time() + self.sticky)
+
+    def on_event(self, payload: dict[str, Any]) -> None:
+        """Room event feed callback, makes room writes from every worker sticky"""
+        if payload["room_id"] is None:  # the feed lost events, any room may have changed
+            self._all_written_until = time.time() + self.sticky
+        else:
+            self.note_write("room", payload["room_id"])
+
+    def route(self, room_id: str | None = None, user_id: Any = None) -> Replica | None:
+        """:returns: replica to read from, None for the primary"""
+        if not self.enabled:
+            return None
+        if (
+            time.time() < self._all_written_until
+            or (room_id is not None and self._written.get(("room", room_id)))
+            or (user_id is not None and self._written.get(("user", user_id)))
+        ):
+            DB_READ_ROUTE.labels("primary_sticky").inc()
+            return None
+        now = time.time()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._turn) % len(self.replicas)]
+            if replica.down_until <= now and replica.lag <= self.max_lag:
+                replica.reads += 1
+                DB_READ_ROUTE.labels("replica").inc()
+                return replica
+        DB_READ_ROUTE.labels("primary_fallback").inc()
+        return None
+
+    def mark_failed(self, replica: Replica, error: Exception) -> None:
+        """Also called from sync dependencies in the threadpool, so it only sets the
+        replica's own fields and never touches the router's caches"""
+        replica.down_until = time.time() + self.retry
+        replica.failures += 1
+        logger.warning(
+            "replica unavailable, reading from the primary",
+            extra={"replica": replica.name, "error": repr(error), "retry_in": self.retry},
+        )
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                replica.lag = await asyncio.to_thread(replica.measure_lag)
+            except SQLAlchemyError as e:
+                self.mark_failed(replica, e)
+            else:
+                replica.down_until = 0.0
+                if replica.lag > self.max_lag:
+                    logger.warning(
+                        "replica lagging, reading from the primary",
+                        extra={"replica": replica.name, "lag_seconds": replica.lag},
+                    )
+
+    async def _check_forever(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        if self.enabled and self._checker is None:
+            self._checker = asyncio.create_task(self._check_forever())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def stats(self) -> list[dict[str, Any]]:
+        now = time.time()
+        return [
+            {
+                "replica": r.name,
+                "up": r.down_until <= now,
+                "lag_seconds": r.lag,
+                "reads": r.reads,
+                "failures": r.failures,
+                "pool": r.pool_stats(),
+            }
+            for r in self.replicas
+        ]
+
+
+replicas = ReplicaRouter(
+    settings.DB_REPLICA_URIS,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    sticky=settings.DB_REPLICA_STICKY,
+    retry=settings.DB_REPLICA_RETRY,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
+hub.add_callback(replicas.on_event)
@@ -1,17 +1,21 @@
-from datetime import datetime, timedelta, timezone
+from datetime import UTC, datetime, timedelta
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
 
 from app import crud
+from app.core.cache import token_cache
 from app.core.config import settings
+from app.core.db import DBSession
+from app.core.hasher import hasher
+from app.core.replicas import READ_METHODS, replicas
 from app.exceptions import AuthenticationError, AuthorizationError, NotFoundError
-from app.schemas import RoomPrivate, User, UserPrivate
+from app.schemas import RoomAccess, User, UserPrivate
+
+ROOM_TOKEN_TYPE = "room"
 
 
 class Authenticator:
@@ -20,24 +24,26 @@ class Authenticator:
         secret_key: str = settings.jwt_secret_key,
         algorithm: str = settings.jwt_algorithm,
         expiration_time: int = settings.jwt_exp_time,
+        room_expiration_time: int = settings.room_token_exp_time,
     ):
         self.secret_key = secret_key
         self.algorithm = algorithm
         self.expiration_time = expiration_time
-        self.password_hash = PasswordHash.recommended()
+        self.room_expiration_time = room_expiration_time
+        self.password_hash = hasher
 
-    def verify_password(self, password: str, hash: str) -> bool:
-        verify = self.password_hash.verify(password, hash)
+    async def verify_password(self, password: str, hash: str) -> bool:
+        verify = await self.password_hash.verify(password, hash)
         if not verify:
             raise AuthenticationError
         return True
 
-    def hash_password(self, password: str) -> str:
-        return self.password_hash.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await self.password_hash.hash(password)
 
     def create_access_token(self, user_id: UUID) -> str:
         exp = timedelta(minutes=self.expiration_time)
-        now = datetime.now(tz=timezone.utc)
+        now = datetime.now(tz=UTC)
         payload = {
             "sub": str(user_id),
             "iat": now,
@@ -46,21 +52,73 @@ class Authenticator:
         encoded_jwt = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
 
-    def authenticate_user(self, db: Session, input: User) -> UserPrivate:
+    async def authenticate_user(self, db: DBSession, input: User) -> UserPrivate:
         try:
-            user = crud.get_user_by_username(db, input.username)
-            self.verify_password(input.password, user.password)
+            user = await crud.get_user_by_username(db, input.username)
+            await self.verify_password(input.password, user.password)
         except (NotFoundError, AuthenticationError) as e:
             raise AuthenticationError from e
         return user
 
-    def auth_room(self, db: Session, room_id: str, room_pw: str) -> RoomPrivate:
+    def create_room_token(self, user_id: UUID, room: RoomAccess) -> str:
+        """Short-lived capability for one user in one room.
+        `rv` pins the room's auth_version, bumping it revokes every issued token"""
+        exp = timedelta(minutes=self.room_expiration_time)
+        now = datetime.now(tz=UTC)
+        payload = {
+            "sub": str(user_id),
+            "typ": ROOM_TOKEN_TYPE,
+            "room": room.id,
+            "rv": room.auth_version,
+            "iat": now,
+            "exp": now + exp,
+        }
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+
+    def verify_room_token(self, token: str, user_id: UUID, room: RoomAccess) -> bool:
         try:
-            room = crud.get_room(db, room_id)
-            self.verify_password(room_pw, room.password)
-        except (NotFoundError, AuthenticationError) as e:
+            payload = jwt.decode(token, self.secret_key, algorithms=self.algorithm)
+        except JWTError as e:
+            raise AuthorizationError from e
+        if (
+            payload.get("typ") != ROOM_TOKEN_TYPE
+            or payload.get("sub") != str(user_id)
+            or payload.get("room") != room.id
+            or payload.get("rv") != room.auth_version
+        ):
+            raise AuthorizationError
+        return True
+
+    async def auth_room(
+        self,
+        db: DBSession,
+        room_id: str,
+        room_pw: str | None = None,
+        user_id: UUID | None = None,
+        room_token: str | None = None,
+    ) -> RoomAccess:
+        """Checks the room token first, which costs one indexed lookup.
+        Falls back to the Argon2 PIN check when there is no valid token"""
+        try:
+            room = await crud.get_room(db, room_id)
+        except NotFoundError as e:
+            raise AuthorizationError from e
+        access = RoomAccess(id=room.id, auth_version=room.auth_version)
+        if room_token is not None and user_id is not None:
+            try:
+                self.verify_room_token(room_token, user_id, access)
+                access.via_token = True
+                return access
+            except AuthorizationError:
+                if room_pw is None:
+                    raise
+        if room_pw is None:
+            raise AuthorizationError
+        try:
+            await self.verify_password(room_pw, room.password)
+        except AuthenticationError as e:
             raise AuthorizationError from e
-        return room
+        return access
 
 
 # OAuth2
@@ -68,6 +126,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 def decode_token(token: str) -> UUID:
+    """Verified tokens are cached until they expire, repeat calls skip the signature check"""
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(
             token,
@@ -80,12 +142,21 @@ def decode_token(token: str) -> UUID:
         )
     except JWTError as e:
         raise AuthenticationError from e
+    if payload.get("typ") == ROOM_TOKEN_TYPE:  # room tokens don't authenticate users
+        raise AuthenticationError
     user_id = UUID(payload["sub"])
+    token_cache.put(token, user_id, expires_at=payload["exp"])
     return user_id
 
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> UUID:
-    """Decode token -> Validate token -> Get user
+async def get_current_user(
+    request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> UUID:
+    """Decode token -> Validate token -> Get user.
+    Async so it runs on the event loop instead of a threadpool hop, token_cache relies on that
     :returns: User ID (type UUID)"""
     user_id = decode_token(token)
+    if request.method not in READ_METHODS:  # the user's next reads skip replicas for a while
+        replicas.note_write("user", user_id)
     return user_id
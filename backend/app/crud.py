@@ -1,35 +1,74 @@
+import copy
+import re
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
 from typing import Any, Type
 from uuid import UUID
 
-from sqlalchemy import delete, select, update
-from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Integer,
+    Select,
+    String,
+    Text,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, JSONPATH, TSVECTOR
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
 
-from app.dbmodels import Items, Rooms, Users
+from app.core.db import (
+    DBSession,
+    commit,
+    dialect_name,
+    execute,
+    queue_for_write,
+    rollback,
+    stream,
+)
+from app.core.events import publish
+from app.dbmodels import SEARCH_CONFIG, Items, RoomIDReservations, Rooms, Users
 from app.dbmodels import room_membership as RoomMem
 from app.exceptions import DBError, NotFoundError
 from app.schemas import (
     Item,
+    ItemFields,
+    ItemModifier,
     ItemsList,
+    ItemSummary,
+    ItemSummaryList,
+    ItemVersion,
+    JSONPatchOperation,
     Result,
     Room,
+    RoomCreate,
     RoomPrivate,
     RoomsList,
+    SearchHit,
+    SearchResults,
     UserPrivate,
 )
 
 
-def create_db(db: Session, data: object) -> Result:
+async def create_db(db: DBSession, data: object) -> Result:
     record = data.__repr__()  # so i don't have to add a refresh() after commit()
     try:
         db.add(data)
-        db.commit()
+        await commit(db)
     except IntegrityError:
-        db.rollback()
+        await rollback(db)
         return Result(success=False, detail=f"{record} already exists in DB", status_code=409)
     except SQLAlchemyError:
-        db.rollback()
+        await rollback(db)
         return Result(success=False, detail="DB error", status_code=500)
     return Result(detail="succesfully created")
 
@@ -41,7 +80,7 @@ TABLE_ID_REGISTRY: dict[Any, Type] = {
 }
 
 
-def delete_db(db: Session, id: Any, **kwargs) -> Result:
+async def delete_db(db: DBSession, id: Any, **kwargs) -> Result:
     """:params data: any of User ID, Room ID or Item ID"""
     table = TABLE_ID_REGISTRY.get(type(id))
     if table is None:
@@ -52,122 +91,754 @@ def delete_db(db: Session, id: Any, **kwargs) -> Result:
         room_id = kwargs["room_id"]
         stmt = stmt.where(table.room_id == room_id)
     try:
-        db.execute(stmt)
-        db.commit()
+        await execute(db, stmt)
+        if table is Rooms:
+            await publish(db, id, "room.deleted")
+        await commit(db)
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         return Result(success=False, detail=f"error: {e}")
     return Result(detail="successfully deleted")
 
 
-def get_user_by_username(db: Session, username: str) -> UserPrivate:
+def _upsert(db: DBSession, table: Any):
+    """INSERT supporting ON CONFLICT, both dialects share the on_conflict_* API"""
+    dialect_insert = sqlite.insert if dialect_name(db) == "sqlite" else postgresql.insert
+    return dialect_insert(table)
+
+
+async def reserve_room_id(db: DBSession, room_id: str, expires_at: datetime) -> bool:
+    """Single statement: reserve `room_id` unless a room or a live reservation holds it.
+    Expired reservations are taken over
+    :returns: whether the ID is now reserved"""
+    room_exists = select(Rooms.id).where(Rooms.id == room_id).exists()
+    candidate = select(literal(room_id), literal(expires_at)).where(~room_exists)
+    stmt = _upsert(db, RoomIDReservations).from_select(["id", "expires_at"], candidate)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RoomIDReservations.id],
+        set_={"expires_at": stmt.excluded.expires_at},
+        where=RoomIDReservations.expires_at < datetime.now(tz=expires_at.tzinfo),
+    ).returning(RoomIDReservations.id)
+    try:
+        reserved = (await execute(db, stmt)).scalar_one_or_none()
+        await commit(db)
+    except SQLAlchemyError:
+        await rollback(db)
+        raise
+    return reserved is not None
+
+
+async def purge_room_id_reservations(db: DBSession, now: datetime) -> Result:
+    stmt = delete(RoomIDReservations).where(RoomIDReservations.expires_at < now)
+    try:
+        await execute(db, stmt)
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail="DB operation failure", data=e, status_code=500)
+    return Result(detail="expired reservations removed")
+
+
+async def create_room_with_member(db: DBSession, room: RoomCreate, user_id: UUID) -> Result:
+    """Insert room, release its ID reservation and add the creator as member,
+    all in one transaction"""
+    try:
+        await execute(db, delete(RoomIDReservations).where(RoomIDReservations.id == room.id))
+        await execute(db, insert(Rooms).values(**room.model_dump()))
+        await execute(db, insert(RoomMem).values(user_id=user_id, room_id=room.id))
+        await commit(db)
+    except IntegrityError:
+        await rollback(db)
+        return Result(success=False, detail=f"room {room.id} already exists", status_code=409)
+    except SQLAlchemyError:
+        await rollback(db)
+        return Result(success=False, detail="DB error", status_code=500)
+    return Result(detail="succesfully created")
+
+
+async def get_user_by_username(db: DBSession, username: str) -> UserPrivate:
     stmt = select(Users).where(Users.username == username)
-    result = db.execute(stmt).scalar_one_or_none()
+    result = (await execute(db, stmt)).scalar_one_or_none()
     if not result:
         raise NotFoundError(f"user of {username} doesn't exist")
     user = UserPrivate(id=result.id, username=result.username, password=result.password)
     return user
 
 
-def get_user_by_id(db: Session, user_id: UUID) -> UserPrivate:
+async def get_user_by_id(db: DBSession, user_id: UUID) -> UserPrivate:
     stmt = select(Users).where(Users.id == user_id)
-    result = db.execute(stmt).scalar_one_or_none()
+    result = (await execute(db, stmt)).scalar_one_or_none()
     if not result:
         raise NotFoundError(detail="user doesn't exist")
     user = UserPrivate(id=result.id, username=result.username, password=result.password)
     return user
 
 
-def user_leave_room(db: Session, user_id: UUID, room_id: str) -> Result:
-    """Remove user from room membership"""
+async def user_leave_room(db: DBSession, user_id: UUID, room_id: str) -> Result:
+    """Remove user from room membership and revoke the room's tokens"""
     stmt = delete(RoomMem).where(RoomMem.c.user_id == user_id).where(RoomMem.c.room_id == room_id)
     try:
-        db.execute(stmt)
-        db.commit()
+        await execute(db, stmt)
+        await execute(db, _bump_auth_version(Rooms.id == room_id))
+        await commit(db)
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         # raise DBError from e
         return Result(success=False, detail="failed to leave room", data=e)
     return Result(detail="leave room successful")
 
 
-def insert_if_not_exists(db: Session, data: dict[str, Any]) -> Result:
-    stmt = insert(RoomMem).values(**data)
+def _bump_auth_version(*where: Any):
+    return update(Rooms).where(*where).values(auth_version=Rooms.auth_version + 1)
+
+
+async def invalidate_room_tokens(
+    db: DBSession,
+    room_id: str | None = None,
+    user_id: UUID | None = None,
+) -> Result:
+    """Revoke room tokens of one room, or of every room the user is a member of"""
+    if room_id is not None:
+        stmt = _bump_auth_version(Rooms.id == room_id)
+    elif user_id is not None:
+        member_of = select(RoomMem.c.room_id).where(RoomMem.c.user_id == user_id)
+        stmt = _bump_auth_version(Rooms.id.in_(member_of))
+    else:
+        raise DBError("room_id or user_id is required")
+    try:
+        await execute(db, stmt)
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail="DB operation failure", data=e, status_code=500)
+    return Result(detail="room tokens revoked")
+
+
+async def insert_if_not_exists(db: DBSession, data: dict[str, Any]) -> Result:
+    stmt = _upsert(db, RoomMem).values(**data)
     pkeys = [c.name for c in RoomMem.primary_key]
     try:
-        db.execute(stmt.on_conflict_do_nothing(index_elements=pkeys))
-        db.commit()
+        await execute(db, stmt.on_conflict_do_nothing(index_elements=pkeys))
+        await commit(db)
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         return Result(success=False, detail="DB operation failure", data=e, status_code=500)
     return Result(detail="successfully entered room")
 
 
-def get_user_rooms(db: Session, user_id: UUID) -> RoomsList:
+async def get_user_rooms(db: DBSession, user_id: UUID) -> RoomsList:
     stmt = (
         select(RoomMem, Rooms.name.label("room_name"))
         .where(RoomMem.c.user_id == user_id)
         .join(Rooms)
     )
-    result = db.execute(stmt).all()
+    result = (await execute(db, stmt)).all()
     rooms_list = RoomsList(
         rooms=[Room(id=r.room_id, name=r.room_name) for r in result] if result else None
     )
     return rooms_list
 
 
-def get_room(db: Session, room_id: str) -> RoomPrivate:
-    stmt = select(Rooms.id, Rooms.password).where(Rooms.id == room_id)
-    result = db.execute(stmt).one_or_none()
+async def get_room(db: DBSession, room_id: str) -> RoomPrivate:
+    stmt = select(Rooms.id, Rooms.password, Rooms.auth_version).where(Rooms.id == room_id)
+    result = (await execute(db, stmt)).one_or_none()
     if not result:
         raise NotFoundError(detail="room doesn't exist")
-    id, password = result.tuple()
-    room = RoomPrivate(id=id, password=password)
+    id, password, auth_version = result.tuple()
+    room = RoomPrivate(id=id, password=password, auth_version=auth_version)
     return room
 
 
-def get_all_room_items(db: Session, room_id: str) -> ItemsList:
-    """:returns: list of all items in room"""
-    stmt = select(Items).where(Items.room_id == room_id)
-    result = db.execute(stmt).scalars()
-    items = [Item(id=item.id, title=item.title, content_json=item.content_json) for item in result]
-    items_list = ItemsList(items=items)
+async def get_all_room_items(
+    db: DBSession,
+    room_id: str,
+    after: int | None = None,
+    limit: int | None = None,
+    fields: ItemFields = "full",
+) -> ItemsList | ItemSummaryList:
+    """Keyset pagination on Items.id. `fields="summary"` never reads content_json
+    :returns: up to `limit` items after item ID `after`, with the cursor of the next page"""
+    if fields == "summary":
+        stmt = select(Items.id, Items.title, Items.updated_at)
+    else:
+        stmt = select(Items.id, Items.title, Items.content_json, Items.version)
+    stmt = stmt.where(Items.room_id == room_id).order_by(Items.id)
+    if after is not None:
+        stmt = stmt.where(Items.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)  # one extra row tells whether there is a next page
+    result = (await execute(db, stmt)).all()
+    next_cursor = None
+    if limit is not None and len(result) > limit:
+        result = result[:limit]
+        next_cursor = result[-1].id
+    if fields == "summary":
+        summaries = [ItemSummary(id=r.id, title=r.title, updated_at=r.updated_at) for r in result]
+        return ItemSummaryList(items=summaries, next_cursor=next_cursor)
+    items = [
+        Item(id=r.id, title=r.title, content_json=r.content_json, version=r.version) for r in result
+    ]
+    items_list = ItemsList(items=items, next_cursor=next_cursor)
     return items_list
 
 
-def edit_room_data(db: Session, room_id: str, room_name: str) -> Result:
+async def stream_room_items(db: DBSession, room_id: str, batch_size: int) -> AsyncIterator[Item]:
+    """Yield every item in room without holding the whole room in memory"""
+    stmt = (
+        select(Items.id, Items.title, Items.content_json, Items.version)
+        .where(Items.room_id == room_id)
+        .order_by(Items.id)
+    )
+    async for row in stream(db, stmt, batch_size):
+        yield Item(id=row.id, title=row.title, content_json=row.content_json, version=row.version)
+
+
+async def edit_room_data(db: DBSession, room_id: str, room_name: str) -> Result:
     stmt = update(Rooms).where(Rooms.id == room_id).values(name=room_name)
     try:
-        db.execute(stmt)
-        db.commit()
+        await execute(db, stmt)
+        await commit(db)
     except SQLAlchemyError as e:
-        db.rollback()
+        await rollback(db)
         return Result(success=False, detail="DB operation failure", data=e, status_code=500)
     return Result(detail="room data edited")
 
 
-def get_item(db: Session, data: Items) -> Result:
+def _touch_room(room_id: str):
+    """Item writes bump the room version in the same transaction"""
+    return update(Rooms).where(Rooms.id == room_id).values(version=Rooms.version + 1)
+
+
+async def get_room_version(db: DBSession, room_id: str) -> int:
+    stmt = select(Rooms.version).where(Rooms.id == room_id)
+    version = (await execute(db, stmt)).scalar_one_or_none()
+    if version is None:
+        raise NotFoundError(detail="room doesn't exist")
+    return version
+
+
+async def get_item_version(db: DBSession, room_id: str, item_id: int) -> int:
+    stmt = select(Items.version).where(Items.room_id == room_id, Items.id == item_id)
+    version = (await execute(db, stmt)).scalar_one_or_none()
+    if version is None:
+        raise NotFoundError(detail="item doesn't exist")
+    return version
+
+
+async def get_item(db: DBSession, data: Items) -> Result:
     stmt = select(Items).where(Items.room_id == data.room_id).where(Items.id == data.id)
-    result = db.execute(stmt).scalar_one_or_none()
+    result = (await execute(db, stmt)).scalar_one_or_none()
     if result is None:
         return Result(success=False, detail="item doesn't exist")
-    item = Item(id=result.id, title=result.title, content_json=result.content_json)
+    item = Item(
+        id=result.id,
+        title=result.title,
+        content_json=result.content_json,
+        version=result.version,
+    )
     return Result(detail="item found", data=item)
 
 
-def update_item(db: Session, data: Items) -> Result:
-    item = Item(id=data.id, title=data.title, content_json=data.content_json)
+async def insert_item(db: DBSession, data: Items) -> Result:
+    """Resulting item ID is in Result.data"""
+    record = data.__repr__()
+    stmt = (
+        insert(Items)
+        .values(title=data.title, content_json=data.content_json, room_id=data.room_id)
+        .returning(Items.id)
+    )
+    try:
+        item_id = (await execute(db, stmt)).scalar_one()
+        await execute(db, _touch_room(data.room_id))
+        await publish(db, data.room_id, "item.created", [item_id])
+        await commit(db)
+    except IntegrityError:
+        await rollback(db)
+        return Result(success=False, detail=f"{record} already exists in DB", status_code=409)
+    except SQLAlchemyError:
+        await rollback(db)
+        return Result(success=False, detail="DB error", status_code=500)
+    return Result(detail="succesfully created", data=item_id)
+
+
+async def update_item(db: DBSession, data: Items, expected_version: int | None = None) -> Result:
+    """`expected_version` makes the update conditional (If-Match)"""
     stmt = (
         update(Items)
         .where(Items.room_id == data.room_id)
         .where(Items.id == data.id)
-        .values(title=data.title, content_json=data.content_json)
+        .values(title=data.title, content_json=data.content_json, version=Items.version + 1)
+        .returning(Items.version)
+        .execution_options(synchronize_session=False)
     )
+    if expected_version is not None:
+        stmt = stmt.where(Items.version == expected_version)
     try:
-        db.execute(stmt)
-        db.commit()
+        version = (await execute(db, stmt)).scalar_one_or_none()
+        if version is not None:
+            await execute(db, _touch_room(data.room_id))
+            await publish(db, data.room_id, "item.updated", [data.id])
+        await commit(db)
     except SQLAlchemyError:
-        db.rollback()
+        await rollback(db)
         raise
+    if version is None:
+        return await _missed_write(db, data.room_id, data.id, expected_version)
+    item = Item(id=data.id, title=data.title, content_json=data.content_json, version=version)
     result = Result(detail="successfully updated item", data=item)
     return result
+
+
+async def delete_item(
+    db: DBSession,
+    room_id: str,
+    item_id: int,
+    expected_version: int | None = None,
+) -> Result:
+    """`expected_version` makes the delete conditional (If-Match)"""
+    stmt = (
+        delete(Items)
+        .where(Items.room_id == room_id, Items.id == item_id)
+        .returning(Items.id)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Items.version == expected_version)
+    try:
+        deleted = (await execute(db, stmt)).scalar_one_or_none()
+        if deleted is not None:
+            await execute(db, _touch_room(room_id))
+            await publish(db, room_id, "item.deleted", [item_id])
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail=f"error: {e}", status_code=500)
+    if deleted is None:
+        return await _missed_write(db, room_id, item_id, expected_version)
+    return Result(detail="successfully deleted")
+
+
+async def _missed_write(
+    db: DBSession,
+    room_id: str,
+    item_id: int,
+    expected_version: int | None,
+    detail: str = "item changed during the write",
+) -> Result:
+    """Explains a conditional write that matched no row:
+    missing item (404), stale If-Match version (412), otherwise a conflict (409)"""
+    try:
+        version = await get_item_version(db, room_id, item_id)
+    except NotFoundError:
+        return Result(success=False, detail="item doesn't exist", status_code=404)
+    if expected_version is not None and version != expected_version:
+        return Result(success=False, detail="item was modified by someone else", status_code=412)
+    return Result(success=False, detail=detail, status_code=409)
+
+
+async def apply_item_batch(
+    db: DBSession,
+    room_id: str,
+    creates: list[ItemModifier],
+    updates: list[ItemModifier],
+    deletes: list[int],
+) -> Result:
+    """Apply creates, then updates, then deletes in one transaction,
+    one statement per kind
+
+    Result.data is (created IDs in input order, updated IDs, deleted IDs)"""
+    created: list[int] = []
+    updated: set[int] = set()
+    deleted: set[int] = set()
+    try:
+        if creates:
+            stmt = insert(Items).returning(Items.id, sort_by_parameter_order=True)
+            rows = [c.model_dump(include={"title", "content_json", "room_id"}) for c in creates]
+            created = list((await execute(db, stmt, rows)).scalars())
+        if updates and dialect_name(db) == "postgresql":
+            changes = values(
+                column("id", Integer),
+                column("title", String),
+                column("content_json", JSONB),
+                name="changes",
+            ).data([(u.id, u.title, u.content_json) for u in updates])
+            stmt = (
+                update(Items)
+                .where(Items.id == changes.c.id, Items.room_id == room_id)
+                .values(
+                    title=changes.c.title,
+                    content_json=changes.c.content_json,
+                    version=Items.version + 1,
+                )
+                .returning(Items.id)
+                .execution_options(synchronize_session=False)
+            )
+            updated = set((await execute(db, stmt)).scalars())
+        elif updates:  # SQLite can't join a VALUES list, one UPDATE per item
+            for u in updates:
+                stmt = (
+                    update(Items)
+                    .where(Items.id == u.id, Items.room_id == room_id)
+                    .values(title=u.title, content_json=u.content_json, version=Items.version + 1)
+                    .returning(Items.id)
+                    .execution_options(synchronize_session=False)
+                )
+                updated.update((await execute(db, stmt)).scalars())
+        if deletes:
+            stmt = (
+                delete(Items)
+                .where(Items.room_id == room_id, Items.id.in_(deletes))
+                .returning(Items.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = set((await execute(db, stmt)).scalars())
+        if created or updated or deleted:
+            await execute(db, _touch_room(room_id))
+        for event, ids in (
+            ("item.created", created),
+            ("item.updated", sorted(updated)),
+            ("item.deleted", sorted(deleted)),
+        ):
+            if ids:
+                await publish(db, room_id, event, ids)
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail="batch rolled back", data=e, status_code=500)
+    return Result(detail="batch applied", data=(created, updated, deleted))
+
+
+def _json_pointer(path: str) -> list[str]:
+    return [p.replace("~1", "/").replace("~0", "~") for p in path.split("/")[1:]]
+
+
+def _fits_one_statement(operations: list[JSONPatchOperation]) -> bool:
+    """Whether checking every operation against the stored document, as _patched_content
+    does, is the same as applying them one after another: no operation may touch what an
+    earlier one changed. Appends to the same array are the exception, they stay in order.
+    Negative indexes, which jsonb counts from the end, are left to _apply_patch too"""
+    changed: list[tuple[list[str], bool]] = []  # (changed path or container, by appending)
+    for operation in operations:
+        path = _json_pointer(operation.path)
+        append = operation.op == "add" and path[-1] == "-"
+        if any(p.startswith("-") for p in (path[:-1] if append else path)):
+            return False
+        for scope, appended in changed:
+            n = min(len(scope), len(path))
+            if scope[:n] == path[:n] and not (append and appended and scope == path[:-1]):
+                return False
+        if operation.op in ("add", "remove"):
+            changed.append((path[:-1], append))  # array members after it shift
+        elif operation.op == "replace":
+            changed.append((path, False))
+    return True
+
+
+def _patched_content(operations: list[JSONPatchOperation]) -> tuple[Any, list[Any]]:
+    """Fold an order-independent JSON Patch into one jsonb expression over Items.content_json.
+    Each operation appears once, so the statement grows linearly with the patch.
+    The conditions only pass when the result matches _apply_patch; a patch they turn away
+    may still apply, see patch_item
+    :returns: new content expression, and conditions on the stored content for the patch to apply"""
+    doc: Any = Items.content_json
+    conditions = []
+    for operation in operations:
+        path = _json_pointer(operation.path)
+        *parents, key = path
+        value = literal(operation.value, JSONB)
+        target = literal(path, ARRAY(Text))
+        stored = Items.content_json.op("#>", return_type=JSONB)(target)
+        if operation.op != "add":
+            conditions.append(stored.is_not(None))
+            if operation.op == "test":
+                conditions.append(stored == value)
+            elif operation.op == "replace":
+                doc = func.jsonb_set(doc, target, value, False, type_=JSONB)
+            else:
+                doc = doc.op("#-", return_type=JSONB)(target)
+            continue
+        # jsonb_set/jsonb_insert skip a missing parent silently, and index past the end
+        parent = Items.content_json
+        if parents:
+            parent = parent.op("#>", return_type=JSONB)(literal(parents, ARRAY(Text)))
+        kind = func.jsonb_typeof(parent)
+        if key == "-":
+            conditions.append(kind == "array")
+            # insert after the last element, jsonb_insert also handles empty arrays
+            end = literal([*parents, "-1"], ARRAY(Text))
+            doc = func.jsonb_insert(doc, end, value, True, type_=JSONB)
+        elif key.isdigit():
+            in_range = func.jsonb_array_length(parent) >= int(key)
+            conditions.append(case((kind == "array", in_range), else_=False))
+            doc = func.jsonb_insert(doc, target, value, False, type_=JSONB)
+        else:
+            conditions.append(kind == "object")
+            doc = func.jsonb_set(doc, target, value, True, type_=JSONB)
+    return doc, conditions
+
+
+async def patch_item(
+    db: DBSession,
+    room_id: str,
+    item_id: int,
+    operations: list[JSONPatchOperation],
+    expected_version: int | None = None,
+) -> Result:
+    """Apply a JSON Patch inside the database with jsonb_set/jsonb_insert,
+    so only the patch travels over the wire. Patches whose operations depend on earlier
+    ones, and any the statement turns away, are applied in Python by _patch_item_read_write,
+    which has the final say
+
+    Result.data is the new ItemVersion"""
+    if dialect_name(db) != "postgresql" or not _fits_one_statement(operations):
+        return await _patch_item_read_write(db, room_id, item_id, operations, expected_version)
+    content, conditions = _patched_content(operations)
+    stmt = (
+        update(Items)
+        .where(Items.room_id == room_id, Items.id == item_id, *conditions)
+        .values(content_json=content, version=Items.version + 1)
+        .returning(Items.id, Items.version)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Items.version == expected_version)
+    try:
+        row = (await execute(db, stmt)).one_or_none()
+        if row is not None:
+            await execute(db, _touch_room(room_id))
+            await publish(db, room_id, "item.updated", [item_id])
+        await commit(db)
+    except DataError:  # e.g. array index into an object
+        await rollback(db)
+        row = None
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail="DB operation failure", data=e, status_code=500)
+    if row is None:  # missing item, stale version or a patch the conditions don't cover
+        return await _patch_item_read_write(db, room_id, item_id, operations, expected_version)
+    return Result(detail="item patched", data=ItemVersion(id=row.id, version=row.version))
+
+
+def _array_index(key: str) -> int:
+    if not key.isdigit():  # "-1" would count from the end
+        raise ValueError(key)
+    return int(key)
+
+
+def _apply_patch(doc: Any, operations: list[JSONPatchOperation]) -> Any:
+    """JSON Patch applied in order, in Python, to a copy of `doc`.
+    Raises KeyError/IndexError/TypeError/ValueError when the patch doesn't apply"""
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        *parents, key = _json_pointer(operation.path)
+        target = doc
+        for parent in parents:
+            target = target[_array_index(parent) if isinstance(target, list) else parent]
+        if isinstance(target, list) and operation.op == "add":
+            if key == "-":
+                target.append(operation.value)
+            elif _array_index(key) > len(target):
+                raise IndexError(key)
+            else:
+                target.insert(int(key), operation.value)
+            continue
+        index = _array_index(key) if isinstance(target, list) else key
+        if operation.op == "add":
+            target[index] = operation.value
+        elif operation.op == "replace":
+            target[index]  # must exist
+            target[index] = operation.value
+        elif operation.op == "remove":
+            del target[index]
+        elif operation.op == "test" and target[index] != operation.value:
+            raise ValueError(operation.path)
+    return doc
+
+
+async def _patch_item_read_write(
+    db: DBSession,
+    room_id: str,
+    item_id: int,
+    operations: list[JSONPatchOperation],
+    expected_version: int | None = None,
+) -> Result:
+    """patch_item for databases without jsonb functions, and for patches the single
+    statement can't express: read the item, patch it in Python, write it back only if
+    its version didn't move in between"""
+    await queue_for_write(db)  # no other write from this worker between the read and the write
+    stmt = select(Items.content_json, Items.version).where(
+        Items.room_id == room_id, Items.id == item_id
+    )
+    row = (await execute(db, stmt)).one_or_none()
+    result = None
+    if row is None:
+        result = Result(success=False, detail="item doesn't exist", status_code=404)
+    elif expected_version is not None and row.version != expected_version:
+        result = Result(success=False, detail="item was modified by someone else", status_code=412)
+    else:
+        try:
+            content = _apply_patch(row.content_json, operations)
+        except KeyError, IndexError, TypeError, ValueError:
+            result = Result(success=False, detail="patch doesn't apply to item", status_code=409)
+    if result is not None:
+        await rollback(db)  # ends the transaction, releasing the write lock
+        return result
+    stmt = (
+        update(Items)
+        .where(Items.room_id == room_id, Items.id == item_id, Items.version == row.version)
+        .values(content_json=content, version=Items.version + 1)
+        .returning(Items.id, Items.version)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        written = (await execute(db, stmt)).one_or_none()
+        if written is not None:
+            await execute(db, _touch_room(room_id))
+            await publish(db, room_id, "item.updated", [item_id])
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        return Result(success=False, detail="DB operation failure", data=e, status_code=500)
+    if written is None:
+        return await _missed_write(db, room_id, item_id, expected_version)
+    return Result(detail="item patched", data=ItemVersion(id=written.id, version=written.version))
+
+
+_search_vector = literal_column("items.search", TSVECTOR)
+# every string in content_json, the same values items.search indexes
+_json_strings = cast(literal('strict $.** ? (@.type() == "string")'), JSONPATH)
+
+
+def _search_statement(user_id: UUID, query: str, limit: int, offset: int = 0) -> Select:
+    """The Postgres query behind search_items, `limit + 1` rows"""
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(_search_vector, tsquery)
+    page = (
+        select(
+            Items.id,
+            Items.room_id,
+            Items.title,
+            Items.content,
+            Items.content_json,
+            rank.label("rank"),
+        )
+        .join(RoomMem, RoomMem.c.room_id == Items.room_id)
+        .where(RoomMem.c.user_id == user_id)
+        .where(_search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Items.id.desc())
+        .limit(limit + 1)  # one extra row tells whether there is a next page
+        .offset(offset)
+        .subquery()
+    )
+    strings = func.jsonb_path_query(page.c.content_json, _json_strings).table_valued("value")
+    as_text = strings.c.value.op("#>>")(literal_column("'{}'"))  # JSON string -> text
+    body = select(func.string_agg(as_text, literal(" "))).scalar_subquery()
+    document = func.concat_ws(" ", page.c.title, page.c.content, body)
+    return select(
+        page.c.id,
+        page.c.room_id,
+        page.c.title,
+        page.c.rank,
+        func.ts_headline(
+            SEARCH_CONFIG, document, tsquery, "MaxFragments=2, MaxWords=20, MinWords=5"
+        ).label("snippet"),
+    ).order_by(page.c.rank.desc(), page.c.id.desc())
+
+
+async def search_items(
+    db: DBSession,
+    user_id: UUID,
+    query: str,
+    limit: int,
+    offset: int = 0,
+) -> SearchResults:
+    """Ranked full-text search over the items of every room the user belongs to.
+    Matching uses the GIN index on items.search, snippets are only built for the returned page"""
+    if dialect_name(db) != "postgresql":
+        return await _search_items_scan(db, user_id, query, limit, offset)
+    stmt = _search_statement(user_id, query, limit, offset)
+    result = (await execute(db, stmt)).all()
+    next_offset = None
+    if len(result) > limit:
+        result = result[:limit]
+        next_offset = offset + limit
+    hits = [
+        SearchHit(id=r.id, room_id=r.room_id, title=r.title, snippet=r.snippet, rank=r.rank)
+        for r in result
+    ]
+    return SearchResults(items=hits, next_offset=next_offset)
+
+
+_WORD = re.compile(r"\w+")
+SNIPPET_WORDS = 20
+
+
+def _json_text_values(doc: Any) -> Iterator[str]:
+    """Every string in a JSON document, what _json_strings selects on Postgres"""
+    if isinstance(doc, str):
+        yield doc
+    elif isinstance(doc, dict):
+        for value in doc.values():
+            yield from _json_text_values(value)
+    elif isinstance(doc, list):
+        for value in doc:
+            yield from _json_text_values(value)
+
+
+def _snippet(text: str, terms: set[str]) -> str:
+    """Words around the first match, matches wrapped in <b></b> like ts_headline"""
+    words = text.split()
+    first = next((i for i, w in enumerate(words) if _matches(w, terms)), 0)
+    start = max(0, first - SNIPPET_WORDS // 4)
+    shown = words[start : start + SNIPPET_WORDS]
+    return " ".join(f"<b>{w}</b>" if _matches(w, terms) else w for w in shown)
+
+
+def _matches(word: str, terms: set[str]) -> bool:
+    return any(w.lower() in terms for w in _WORD.findall(word))
+
+
+async def _search_items_scan(
+    db: DBSession,
+    user_id: UUID,
+    query: str,
+    limit: int,
+    offset: int = 0,
+) -> SearchResults:
+    """search_items without a text index: every query word must appear in the title,
+    content or a content_json string. Candidates are narrowed with LIKE, then ranked in
+    Python by matches, title matches counting more. Websearch operators aren't supported"""
+    terms = {w.lower() for w in _WORD.findall(query)}
+    if not terms:
+        return SearchResults(items=[])
+    haystack = func.lower(
+        func.coalesce(Items.title, "")
+        + " "
+        + func.coalesce(Items.content, "")
+        + " "
+        + cast(Items.content_json, Text)
+    )
+    stmt = (
+        select(Items.id, Items.room_id, Items.title, Items.content, Items.content_json)
+        .join(RoomMem, RoomMem.c.room_id == Items.room_id)
+        .where(RoomMem.c.user_id == user_id)
+        .where(*(haystack.contains(t, autoescape=True) for t in terms))
+    )
+    ranked = []
+    for r in (await execute(db, stmt)).all():
+        body = " ".join([r.content or "", *_json_text_values(r.content_json)])
+        title_words = [w.lower() for w in _WORD.findall(r.title or "")]
+        body_words = [w.lower() for w in _WORD.findall(body)]
+        if not terms <= set(title_words) | set(body_words):
+            continue  # LIKE also matched JSON keys and partial words
+        rank = sum(title_words.count(t) + 0.4 * body_words.count(t) for t in terms)
+        document = " ".join(filter(None, [r.title, body]))
+        ranked.append((round(rank, 4), r.id, r.room_id, r.title, _snippet(document, terms)))
+    ranked.sort(key=lambda hit: (hit[0], hit[1]), reverse=True)
+    page = ranked[offset : offset + limit]
+    next_offset = offset + limit if len(ranked) > offset + limit else None
+    hits = [
+        SearchHit(id=id, room_id=room_id, title=title, snippet=snippet, rank=rank)
+        for rank, id, room_id, title, snippet in page
+    ]
+    return SearchResults(items=hits, next_offset=next_offset)
@@ -1,19 +1,36 @@
 """SQLAlchemy database models"""
 
 import uuid
+from datetime import datetime
 from typing import Any, List, Optional
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Table, Uuid
+from sqlalchemy import (
+    DDL,
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    Table,
+    Uuid,
+    event,
+    func,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
 
+# JSONB on Postgres, JSON text elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 room_membership = Table(
     "room_membership",
     Base.metadata,
     Column("user_id", ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
-    Column("room_id", ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True),
+    # the primary key covers user -> rooms, this index covers room -> members
+    Column("room_id", ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True, index=True),
 )
 
 
@@ -32,21 +49,60 @@ class Rooms(Base):
     id: Mapped[str] = mapped_column(String(8), primary_key=True)
     name: Mapped[str] = mapped_column(String(16), nullable=False)
     password: Mapped[str] = mapped_column(String(128), nullable=False)
+    # bumped on membership or password changes to revoke issued room tokens
+    auth_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # bumped with every item write, backs the room contents ETag
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
     members: Mapped[list[Users]] = relationship(secondary=room_membership, back_populates="rooms")
     items: Mapped[list[Items]] = relationship(back_populates="room", cascade="all, delete-orphan")
 
 
+class RoomIDReservations(Base):
+    """Room IDs handed out by /room_id but not yet used to create a room"""
+
+    __tablename__ = "room_id_reservations"
+
+    id: Mapped[str] = mapped_column(String(8), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
 class Items(Base):
     __tablename__ = "items"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     title: Mapped[str] = mapped_column(String(32))
     content: Mapped[Optional[str]] = mapped_column(String(), nullable=True)
-    content_json: Mapped[list[Any]] = mapped_column(JSONB)
+    content_json: Mapped[list[Any]] = mapped_column(JSONDocument)
     room_id: Mapped[str] = mapped_column(
         String(8),
         ForeignKey("rooms.id", ondelete="CASCADE"),
         primary_key=False,
+        index=True,
+    )
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        # also set on insert: on SQLite, m0002 could only add the column with a constant default
+        default=func.now(),
+        server_default=func.now(),
+        onupdate=func.now(),
     )
 
     room: Mapped[Rooms] = relationship(back_populates="items")
+
+
+# Text search configuration baked into items.search, queries must use the same one
+SEARCH_CONFIG = "simple"
+
+# Postgres keeps items.search in sync with title, content and every string in content_json.
+# It isn't mapped, so the ORM never reads or writes it
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B') || "
+    f"setweight(jsonb_to_tsvector('{SEARCH_CONFIG}', content_json, '[\"string\"]'), 'B')"
+)
+for ddl in (
+    f"ALTER TABLE items ADD COLUMN search tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+    "CREATE INDEX ix_items_search ON items USING gin (search)",
+):
+    event.listen(Items.__table__, "after_create", DDL(ddl).execute_if(dialect="postgresql"))
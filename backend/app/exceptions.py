@@ -27,6 +27,14 @@ class DuplicateDataError(HTTPException):
         )
 
 
+class ConflictError(HTTPException):
+    def __init__(self, detail: str | None = None):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail if detail is not None else "Request conflicts with current state",
+        )
+
+
 class NotFoundError(HTTPException):
     def __init__(self, detail: str | None = None):
         super().__init__(
@@ -35,9 +43,43 @@ class NotFoundError(HTTPException):
         )
 
 
+class PreconditionFailedError(HTTPException):
+    def __init__(self, detail: str | None = None):
+        super().__init__(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=detail if detail is not None else "Resource has changed",
+        )
+
+
+class RequestTooLargeError(HTTPException):
+    def __init__(self, detail: str | None = None):
+        super().__init__(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=detail if detail is not None else "Request is too large",
+        )
+
+
+class TooManyRequestsError(HTTPException):
+    def __init__(self, detail: str | None = None, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail if detail is not None else "Too many requests, slow down",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 class DBError(HTTPException):
     def __init__(self, detail: str | None = None):
         super().__init__(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=detail if detail is not None else "Failed to perform database operation",
         )
+
+
+class ServiceUnavailableError(HTTPException):
+    def __init__(self, detail: str | None = None, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail if detail is not None else "Server is busy, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -1,22 +1,57 @@
-import threading
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.api import router as api
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
-from app.core.db import init_db
+from app.core.db import (
+    async_engine,
+    check_db,
+    engine,
+    init_db,
+    warm_async_pool,
+    warm_pool,
+)
+from app.core.events import hub
+from app.core.hasher import hasher
+from app.core.logging import LoggingMiddleware, setup_logging
+from app.core.profiler import QueryProfilerMiddleware
+from app.core.replicas import replicas
+from app.services.rooms import sweep_room_id_reservations
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    threading.Thread(target=init_db()).start()
+    log_listener = setup_logging()
+    log_listener.start()
+    # blocking DB work runs off the loop; the app takes no traffic until this block finishes
+    await asyncio.to_thread(init_db if settings.DB_STARTUP == "migrate" else check_db)
+    if settings.DB_ASYNC:
+        await warm_async_pool(settings.DB_POOL_WARM)
+    else:
+        await asyncio.to_thread(warm_pool, settings.DB_POOL_WARM)
+    await hasher.warm()
+    hub.start()  # other workers' writes invalidate room_cache through this
+    replicas.start()
+    sweeper = asyncio.create_task(sweep_room_id_reservations())
     yield
+    sweeper.cancel()
+    await replicas.stop()
+    await hub.stop()
+    # aiosqlite's connection threads aren't daemons, the process can't exit while they're open
+    await async_engine.dispose()
+    engine.dispose()
+    hasher.shutdown()
+    log_listener.stop()
 
 
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title=settings.app_name,
     version=settings.version,
     prefix=settings.API_V1_URI,
@@ -35,3 +70,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+if settings.DB_PROFILE:
+    app.add_middleware(
+        QueryProfilerMiddleware, n_plus_one_threshold=settings.DB_N_PLUS_ONE_THRESHOLD
+    )
+app.add_middleware(LoggingMiddleware, sample_rates=settings.ACCESS_LOG_SAMPLE_RATES)
@@ -0,0 +1,174 @@
+"""Versioned schema migrations.
+
+Each migration is a module in this package named `mNNNN_<what>.py` with
+`upgrade(conn)`; `TRANSACTIONAL = False` runs it in autocommit mode, which
+`CREATE INDEX CONCURRENTLY` needs. Applied versions are recorded in `schema_version`.
+
+A database without our tables is created from the models with `create_all`
+and stamped with every version, so migrations only ever run against older schemas.
+
+    python -m app.migrations [upgrade|current|pending]
+"""
+
+import importlib
+import logging
+import pkgutil
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from types import ModuleType
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.core.db import Base
+
+logger = logging.getLogger(__name__)
+
+# an arbitrary constant, keeps workers starting at the same time from migrating twice
+LOCK_ID = 0x6F75726E6F7465
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(64), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def _modules() -> list[tuple[int, str, str]]:
+    """:returns: (version, name, module name) of every migration, without importing them"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("m"):
+            version, _, name = info.name[1:].partition("_")
+            found.append((int(version), name, info.name))
+    return sorted(found)
+
+
+def discover() -> list[Migration]:
+    return [
+        Migration(version, name, importlib.import_module(f"{__name__}.{module}"))
+        for version, name, module in _modules()
+    ]
+
+
+def head() -> int:
+    migrations = _modules()
+    return migrations[-1][0] if migrations else 0
+
+
+def check(engine: Engine) -> int:
+    """One query to confirm the database is at head, for startup without DDL
+    :returns: schema version"""
+    with engine.connect() as conn:
+        try:
+            version = conn.execute(select(func.max(schema_version.c.version))).scalar()
+        except DBAPIError:
+            # only a missing version table means "not migrated", anything else is an outage
+            conn.rollback()
+            if inspect(conn).has_table(schema_version.name):
+                raise
+            version = None
+    if version is None or version < head():
+        found = "not migrated" if version is None else f"at version {version}"
+        raise SchemaVersionError(
+            f"database schema is {found}, this build expects {head()}. "
+            "Run `python -m app.migrations upgrade` or start with DB_STARTUP=migrate"
+        )
+    if version > head():  # a newer build migrated first, fine while rolling out
+        logger.warning("database schema %s is ahead of this build (%s)", version, head())
+    return version
+
+
+def current(conn: Connection) -> int | None:
+    """:returns: highest applied version, None if the database was never migrated"""
+    if not inspect(conn).has_table(schema_version.name):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def pending(conn: Connection) -> list[Migration]:
+    version = current(conn) or 0
+    return [m for m in discover() if m.version > version]
+
+
+def _stamp(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_version.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.now(tz=UTC),
+        )
+    )
+
+
+def migrate(engine: Engine) -> list[Migration]:
+    """Bring the database up to head
+    :returns: migrations that were applied"""
+    import app.dbmodels  # noqa: F401 - registers the tables on Base.metadata
+
+    # autocommit, an open transaction here would stall CREATE INDEX CONCURRENTLY
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        is_postgres = engine.dialect.name == "postgresql"
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": LOCK_ID})
+        try:
+            return _migrate(engine)
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": LOCK_ID})
+
+
+def _migrate(engine: Engine) -> list[Migration]:
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        fresh = not inspect(conn).has_table("users")
+        if fresh:
+            Base.metadata.create_all(conn)
+            for migration in discover():
+                _stamp(conn, migration)
+            logger.info("created schema at version %s", head())
+            return []
+        todo = pending(conn)
+
+    applied = []
+    for migration in todo:
+        logger.info("applying migration %04d %s", migration.version, migration.name)
+        if migration.transactional:
+            with engine.begin() as conn:
+                migration.module.upgrade(conn)
+                _stamp(conn, migration)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                migration.module.upgrade(conn)
+                _stamp(conn, migration)
+        applied.append(migration)
+    return applied
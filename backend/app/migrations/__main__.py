@@ -0,0 +1,30 @@
+import argparse
+import logging
+
+from app.core.db import engine
+from app.migrations import current, head, migrate, pending
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    parser.add_argument(
+        "command", choices=["upgrade", "current", "pending"], nargs="?", default="upgrade"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "upgrade":
+        applied = migrate(engine)
+        print(f"applied {len(applied)} migration(s), now at {head():04d}")
+        return
+    with engine.connect() as conn:
+        if args.command == "current":
+            version = current(conn)
+            print("not migrated" if version is None else f"{version:04d}")
+        else:
+            for migration in pending(conn):
+                print(f"{migration.version:04d} {migration.name}")
+
+
+if __name__ == "__main__":
+    main()
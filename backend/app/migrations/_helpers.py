@@ -0,0 +1,35 @@
+"""Building blocks for migrations, safe to re-run against a partly migrated schema"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+def create_index(
+    conn: Connection,
+    name: str,
+    table: str,
+    columns: str,
+    using: str | None = None,
+) -> None:
+    """Build an index without blocking writes on Postgres (needs an autocommit connection).
+    An INVALID index left by an interrupted concurrent build is dropped and rebuilt"""
+    method = f" USING {using}" if using else ""
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table}{method} ({columns})"))
+        return
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(
+        text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{method} ({columns})")
+    )
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
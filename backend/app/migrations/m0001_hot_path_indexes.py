@@ -0,0 +1,12 @@
+"""Indexes for listing a room's items and a room's members"""
+
+from sqlalchemy.engine import Connection
+
+from app.migrations._helpers import create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn: Connection) -> None:
+    create_index(conn, "ix_items_room_id", "items", "room_id")
+    create_index(conn, "ix_room_membership_room_id", "room_membership", "room_id")
@@ -0,0 +1,45 @@
+"""Columns and tables added since the first release: room/item versions,
+room token revocation and room ID reservations"""
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, text
+from sqlalchemy.engine import Connection
+
+from app.migrations._helpers import has_column
+
+COLUMNS = [
+    ("rooms", "auth_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("rooms", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("items", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("items", "updated_at", "TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP"),
+]
+
+# the table as this migration created it, later model changes belong in later migrations
+room_id_reservations = Table(
+    "room_id_reservations",
+    MetaData(),
+    Column("id", String(8), primary_key=True),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+)
+
+# SQLite only adds columns with constant defaults to tables that hold rows,
+# so these get a placeholder default and are then backfilled: (definition, value)
+SQLITE_COLUMNS = {
+    ("items", "updated_at"): (
+        "TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:00.000000'",
+        "CURRENT_TIMESTAMP",
+    ),
+}
+
+
+def upgrade(conn: Connection) -> None:
+    sqlite = conn.dialect.name == "sqlite"
+    for table, column, definition in COLUMNS:
+        if has_column(conn, table, column):
+            continue
+        backfill = None
+        if sqlite and (table, column) in SQLITE_COLUMNS:
+            definition, backfill = SQLITE_COLUMNS[table, column]
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+        if backfill is not None:
+            conn.execute(text(f"UPDATE {table} SET {column} = {backfill}"))
+    room_id_reservations.create(conn, checkfirst=True)
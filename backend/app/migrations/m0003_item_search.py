@@ -0,0 +1,30 @@
+"""Generated tsvector column and GIN index behind /search, Postgres only.
+Adding a stored generated column rewrites `items` under an exclusive lock,
+the index is then built without blocking writes"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.migrations._helpers import create_index, has_column
+
+TRANSACTIONAL = False
+
+# the expression as this migration created it, later model changes belong in later migrations
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B') || "
+    "setweight(jsonb_to_tsvector('simple', content_json, '[\"string\"]'), 'B')"
+)
+
+
+def upgrade(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    if not has_column(conn, "items", "search"):
+        conn.execute(
+            text(
+                "ALTER TABLE items ADD COLUMN search tsvector "
+                f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED"
+            )
+        )
+    create_index(conn, "ix_items_search", "items", "search", using="gin")
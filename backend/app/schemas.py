@@ -1,9 +1,10 @@
 """Pydantic schemas"""
 
-from typing import Any, List
+from datetime import datetime
+from typing import Any, List, Literal, Self
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class GlobalBase(BaseModel):
@@ -53,6 +54,18 @@ class Room(GlobalBase):
 
 class RoomPrivate(Room):
     password: str
+    auth_version: int = 0
+
+
+class RoomAccess(GlobalBase):
+    id: str
+    auth_version: int
+    via_token: bool = False
+
+
+class RoomToken(GlobalBase):
+    room_token: str
+    token_type: str = "bearer"
 
 
 class RoomCreate(Room):
@@ -62,6 +75,7 @@ class RoomCreate(Room):
 
 class ItemsList(GlobalBase):
     items: List[Item] | None = None
+    next_cursor: int | None = None  # pass as `after` to get the next page
 
 
 class Item(GlobalBase):
@@ -69,12 +83,88 @@ class Item(GlobalBase):
     title: str
     content: str | None = None
     content_json: list | None = None
+    version: int | None = None
+
+
+ItemFields = Literal["full", "summary"]
+
+
+class ItemSummary(GlobalBase):
+    """Item without its body, fetch the body through the item endpoint"""
+
+    id: int
+    title: str
+    updated_at: datetime | None = None
+
+
+class ItemSummaryList(GlobalBase):
+    items: list[ItemSummary] | None = None
+    next_cursor: int | None = None
+
+
+class SearchHit(GlobalBase):
+    id: int
+    room_id: str
+    title: str
+    snippet: str  # matches wrapped in <b></b>
+    rank: float
+
+
+class SearchResults(GlobalBase):
+    items: list[SearchHit]
+    next_offset: int | None = None  # pass as `offset` to get the next page
 
 
 class ItemModifier(Item):
     room_id: str
 
 
+class ItemOperation(GlobalBase):
+    """create: title + content_json, update: id + title + content_json, delete: id"""
+
+    op: Literal["create", "update", "delete"]
+    id: int | None = None
+    title: str | None = None
+    content_json: list | None = None
+
+
+class ItemBatch(GlobalBase):
+    operations: list[ItemOperation]
+
+
+class ItemOperationResult(GlobalBase):
+    index: int
+    op: str
+    id: int | None = None
+    success: bool = True
+    detail: str
+
+
+class ItemBatchResult(GlobalBase):
+    results: list[ItemOperationResult]
+
+
+class JSONPatchOperation(GlobalBase):
+    """RFC 6902 operation on an item's content_json, applied in order with the others.
+    `path` is a JSON Pointer, whole-document operations are not supported.
+    `value` is required for add/replace/test and may be null"""
+
+    op: Literal["add", "remove", "replace", "test"]
+    path: str = Field(pattern=r"^(/([^~/]|~[01])*)+$")
+    value: Any = None
+
+    @model_validator(mode="after")
+    def _value_given(self) -> Self:
+        if self.op != "remove" and "value" not in self.model_fields_set:
+            raise ValueError(f"`{self.op}` needs a value")
+        return self
+
+
+class ItemVersion(GlobalBase):
+    id: int
+    version: int
+
+
 class ItemPrivate(GlobalBase):
     item_id: int
     room_id: str
@@ -1,55 +1,201 @@
 from typing import Any
+from uuid import UUID
 
-from sqlalchemy.orm import Session
-
-from app.crud import create_db, delete_db, get_item, update_item
+from app.core.cache import room_cache
+from app.core.db import DBSession
+from app.crud import (
+    apply_item_batch,
+    get_item,
+    get_item_version,
+    insert_item,
+    patch_item,
+    update_item,
+)
+from app.crud import delete_item as delete_item_db
+from app.crud import search_items as search_items_db
 from app.dbmodels import Items
-from app.schemas import Item, ItemModifier, ItemPrivate, Result
+from app.schemas import (
+    Item,
+    ItemBatchResult,
+    ItemModifier,
+    ItemOperation,
+    ItemOperationResult,
+    ItemPrivate,
+    JSONPatchOperation,
+    Result,
+    SearchResults,
+)
 
 
 async def create_item(
     room_id: str,
-    db: Session,
+    db: DBSession,
     title: str,
     content_json: list[Any],
 ) -> Result:
     create = ItemModifier(title=title, content_json=content_json, room_id=room_id)
-    data = Items(**create.model_dump())
-    result = create_db(db, data)
+    data = Items(**create.model_dump(exclude={"version"}))
+    result = await insert_item(db, data)
+    if result.success:
+        room_cache.invalidate(room_id)
     return result
 
 
 async def view_existing_item(
     room_id: str,
     item_id: int,
-    db: Session,
+    db: DBSession,
 ) -> Item | None:
     priv = ItemPrivate(item_id=item_id, room_id=room_id)
+    cached = room_cache.get(priv.room_id, "item", priv.item_id)
+    if cached is not None:
+        return cached
+    generation = room_cache.generation(priv.room_id)
     data = Items(id=priv.item_id, room_id=priv.room_id)
-    result = get_item(db, data)
+    result = await get_item(db, data)
     item = result.data
+    if item is not None:
+        room_cache.put(priv.room_id, "item", priv.item_id, value=item, generation=generation)
     return item
 
 
+async def view_item_version(
+    room_id: str,
+    item_id: int,
+    db: DBSession,
+) -> int:
+    """Cheap lookup for conditional GETs, doesn't read content_json"""
+    priv = ItemPrivate(item_id=item_id, room_id=room_id)
+    return await get_item_version(db, priv.room_id, priv.item_id)
+
+
 async def edit_item(
     room_id: str,
     item_id: int,
-    db: Session,
+    db: DBSession,
     title: str,
     content_json: list[Any],
-) -> Item | None:
+    expected_version: int | None = None,
+) -> Result:
+    """Resulting Item is in Result.data"""
     edit = ItemModifier(id=item_id, title=title, content_json=content_json, room_id=room_id)
-    data = Items(**edit.model_dump())
-    result = update_item(db, data)
-    item = result.data
-    return item
+    data = Items(**edit.model_dump(exclude={"version"}))
+    result = await update_item(db, data, expected_version=expected_version)
+    if result.success:
+        room_cache.invalidate(room_id)
+    return result
+
+
+async def patch_existing_item(
+    room_id: str,
+    item_id: int,
+    operations: list[JSONPatchOperation],
+    db: DBSession,
+    expected_version: int | None = None,
+) -> Result:
+    """Resulting ItemVersion is in Result.data"""
+    priv = ItemPrivate(item_id=item_id, room_id=room_id)
+    result = await patch_item(db, priv.room_id, priv.item_id, operations, expected_version)
+    if result.success:
+        room_cache.invalidate(room_id)
+    return result
 
 
 async def delete_item(
     room_id: str,
     item_id: int,
-    db: Session,
+    db: DBSession,
+    expected_version: int | None = None,
 ) -> Result:
     priv = ItemPrivate(room_id=room_id, item_id=item_id)
-    result = delete_db(db, id=priv.item_id, room_id=priv.room_id)
+    result = await delete_item_db(db, priv.room_id, priv.item_id, expected_version)
+    if result.success:
+        room_cache.invalidate(room_id)
+    return result
+
+
+async def apply_batch(
+    room_id: str,
+    operations: list[ItemOperation],
+    db: DBSession,
+) -> ItemBatchResult | None:
+    """Valid operations are applied in one transaction, invalid ones are reported and skipped
+    :returns: one result per operation, None if the transaction failed"""
+    results: dict[int, ItemOperationResult] = {}
+    creates: list[tuple[int, ItemModifier]] = []
+    updates: list[tuple[int, ItemModifier]] = []
+    deletes: list[tuple[int, int]] = []
+    seen_ids: set[int] = set()
+
+    for index, operation in enumerate(operations):
+        error = None
+        if operation.op != "create" and operation.id is None:
+            error = "id is required"
+        elif operation.op != "delete" and None in (operation.title, operation.content_json):
+            error = "title and content_json are required"
+        elif operation.id is not None and operation.id in seen_ids:
+            error = "item appears more than once in batch"
+        if error is not None:
+            results[index] = ItemOperationResult(
+                index=index, op=operation.op, id=operation.id, success=False, detail=error
+            )
+            continue
+
+        if operation.op == "delete":
+            deletes.append((index, operation.id))
+        else:
+            modifier = ItemModifier(
+                id=operation.id,
+                title=operation.title,
+                content_json=operation.content_json,
+                room_id=room_id,
+            )
+            (creates if operation.op == "create" else updates).append((index, modifier))
+        if operation.id is not None:
+            seen_ids.add(operation.id)
+
+    result = await apply_item_batch(
+        db,
+        room_id,
+        creates=[c for _, c in creates],
+        updates=[u for _, u in updates],
+        deletes=[d for _, d in deletes],
+    )
+    if not result.success or result.data is None:
+        return None
+    created, updated, deleted = result.data
+    room_cache.invalidate(room_id)
+
+    for (index, _), item_id in zip(creates, created):
+        results[index] = ItemOperationResult(index=index, op="create", id=item_id, detail="created")
+    for index, modifier in updates:
+        found = modifier.id in updated
+        results[index] = ItemOperationResult(
+            index=index,
+            op="update",
+            id=modifier.id,
+            success=found,
+            detail="updated" if found else "item doesn't exist",
+        )
+    for index, item_id in deletes:
+        found = item_id in deleted
+        results[index] = ItemOperationResult(
+            index=index,
+            op="delete",
+            id=item_id,
+            success=found,
+            detail="deleted" if found else "item doesn't exist",
+        )
+    return ItemBatchResult(results=[results[i] for i in range(len(operations))])
+
+
+async def search_items(
+    user_id: UUID,
+    query: str,
+    db: DBSession,
+    limit: int,
+    offset: int = 0,
+) -> SearchResults:
+    """Searches every room the user is a member of"""
+    result = await search_items_db(db, user_id, query, limit=limit, offset=offset)
     return result
@@ -1,36 +1,54 @@
+import asyncio
+import contextlib
+import json
 import random
 import string
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
 from uuid import UUID
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from app.core.db import engine
+from app.core.cache import room_cache
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, DBSession
+from app.core.events import hub
 from app.core.security import Authenticator
 from app.crud import (
-    create_db,
+    create_room_with_member,
     delete_db,
     edit_room_data,
     get_all_room_items,
     get_user_by_username,
     insert_if_not_exists,
+    purge_room_id_reservations,
+    reserve_room_id,
+    stream_room_items,
     user_leave_room,
 )
-from app.dbmodels import Rooms
+from app.crud import get_room_version as get_room_version_db
 from app.exceptions import AuthenticationError
-from app.schemas import ItemsList, Result, RoomCreate
+from app.schemas import ItemFields, ItemsList, ItemSummaryList, Result, RoomCreate
 
 
-def generate_room_id() -> Result:
-    """Generate unique 8-character ID string for rooms
+async def generate_room_id(db: DBSession) -> Result:
+    """Generate and reserve a unique 8-character ID string for rooms.
+    Costs one query per attempt, bounded by ROOM_ID_MAX_ATTEMPTS
 
     Resulting ID is in Result.data"""
+    expires_at = datetime.now(tz=UTC) + timedelta(seconds=settings.ROOM_ID_RESERVATION_TTL)
+    for _ in range(settings.ROOM_ID_MAX_ATTEMPTS):
+        room_id = "".join(random.choices(string.ascii_letters + string.digits, k=8))
+        if await reserve_room_id(db, room_id, expires_at):
+            return Result(detail="successfully created unique id", data=room_id)
+    return Result(success=False, detail="failed to allocate a room id", status_code=500)
+
+
+async def sweep_room_id_reservations() -> None:
+    """Delete abandoned room ID reservations once per reservation TTL, off the request path.
+    Runs for the app's lifetime"""
     while True:
-        result: str = "".join(random.choices(string.ascii_letters + string.digits, k=8))
-        with Session(engine) as session:
-            match = session.execute(select(Rooms.id).where(Rooms.id == result)).scalar_one_or_none()
-            if match is None:
-                return Result(detail="successfully created unique id", data=result)
+        await asyncio.sleep(settings.ROOM_ID_RESERVATION_TTL)
+        async with AsyncSessionLocal() as db:
+            await purge_room_id_reservations(db, datetime.now(tz=UTC))
 
 
 async def create_room(
@@ -38,52 +56,113 @@ async def create_room(
     room_id: str,
     room_name: str,
     room_pw: str,
-    db: Session,
+    db: DBSession,
     auth: Authenticator,
 ) -> Result:
     """Create room and add user - room membership"""
-    room = RoomCreate(id=room_id, name=room_name, password=auth.hash_password(room_pw))
-    data = Rooms(**room.model_dump())
-    create_result = create_db(db, data)
-    if not create_result.success:
-        return create_result
-    membership = {"user_id": user_id, "room_id": room.id}
-    insert_result = insert_if_not_exists(db, membership)
-    return insert_result
+    room = RoomCreate(id=room_id, name=room_name, password=await auth.hash_password(room_pw))
+    result = await create_room_with_member(db, room, user_id)
+    return result
 
 
 async def join_room(
     user_id: UUID,
     room_id: str,
-    room_pw: str,
-    db: Session,
+    room_pw: str | None,
+    room_token: str | None,
+    db: DBSession,
     auth: Authenticator,
 ) -> Result:
-    """Once user enters a room, user stays a member unless they 'leave' the room"""
-    room = auth.auth_room(db, room_id, room_pw)
+    """Once user enters a room, user stays a member unless they 'leave' the room
+
+    Resulting room token is in Result.data"""
+    room = await auth.auth_room(db, room_id, room_pw, user_id=user_id, room_token=room_token)
+    if room.via_token:  # valid tokens are only held by current members
+        return Result(detail="already a member", data=room_token)
     data = {"user_id": user_id, "room_id": room.id}
-    result = insert_if_not_exists(db, data)
+    result = await insert_if_not_exists(db, data)
+    if result.success:
+        result.data = auth.create_room_token(user_id, room)
     return result
 
 
 async def get_room_contents(
     room_id: str,
-    db: Session,
-) -> ItemsList:
+    db: DBSession,
+    version: int,
+    after: int | None = None,
+    limit: int | None = None,
+    fields: ItemFields = "full",
+) -> ItemsList | ItemSummaryList:
     """Authentication and authorization should be completed beforehand.
-    After that, client uses this function to get all the room items"""
-    result = get_all_room_items(db, room_id)
+    After that, client uses this function to page through the room items.
+    `version` is the room version just read for the ETag. It is part of the cache key, so a
+    worker that hasn't seen another worker's invalidation yet can't pair a stale body with
+    the new ETag"""
+    key = ("items", version, after, limit, fields)
+    cached = room_cache.get(room_id, *key)
+    if cached is not None:
+        return cached
+    generation = room_cache.generation(room_id)
+    result = await get_all_room_items(db, room_id, after=after, limit=limit, fields=fields)
+    room_cache.put(room_id, *key, value=result, generation=generation)
     return result
 
 
+async def get_room_version(
+    room_id: str,
+    db: DBSession,
+) -> int:
+    result = await get_room_version_db(db, room_id)
+    return result
+
+
+async def stream_room_contents(
+    room_id: str,
+    db: DBSession,
+) -> AsyncIterator[bytes]:
+    """Every item in room as newline-delimited JSON"""
+    async for item in stream_room_items(db, room_id, settings.ROOM_STREAM_BATCH):
+        yield item.model_dump_json().encode() + b"\n"
+
+
+async def room_events(room_id: str) -> AsyncIterator[bytes]:
+    """Room changes as Server-Sent Events.
+    A comment line goes out when the room is quiet so proxies keep the connection open"""
+    events = hub.subscribe(room_id)
+    next_event = asyncio.ensure_future(anext(events))
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=settings.EVENTS_KEEPALIVE)
+            if not done:
+                yield b": keepalive\n\n"
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n".encode()
+            next_event = asyncio.ensure_future(anext(events))
+    finally:
+        # the pending read must unwind before the subscription can be closed
+        next_event.cancel()
+        with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+            await next_event
+        await events.aclose()
+
+
 async def delete_room(
+    user_id: UUID,
     room_id: str,
-    room_pw: str,
-    db: Session,
+    room_pw: str | None,
+    room_token: str | None,
+    db: DBSession,
     auth: Authenticator,
 ) -> Result:
-    room = auth.auth_room(db, room_id, room_pw)
-    result = delete_db(db, room.id)
+    room = await auth.auth_room(db, room_id, room_pw, user_id=user_id, room_token=room_token)
+    result = await delete_db(db, room.id)
+    if result.success:
+        room_cache.invalidate(room.id)
     return result
 
 
@@ -92,22 +171,22 @@ async def leave_room(
     username: str,
     password: str,
     room_id: str,
-    db: Session,
+    db: DBSession,
     auth: Authenticator,
 ) -> Result:
-    user = get_user_by_username(db, username)
-    if user.id != user_id or not auth.verify_password(password, user.password):
+    user = await get_user_by_username(db, username)
+    if user.id != user_id or not await auth.verify_password(password, user.password):
         raise AuthenticationError()
-    result = user_leave_room(db, user_id, room_id)
+    result = await user_leave_room(db, user_id, room_id)
     return result
 
 
 async def edit_room_details(
     room_id: str,
     room_name: str,
-    db: Session,
+    db: DBSession,
 ) -> Result:
-    result = edit_room_data(
+    result = await edit_room_data(
         db=db,
         room_id=room_id,
         room_name=room_name,
@@ -1,8 +1,11 @@
+import time
 from uuid import UUID
 
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 
+from app.core.cache import username_cache
+from app.core.config import settings
+from app.core.db import DBSession
 from app.core.security import Authenticator
 from app.crud import (
     create_db,
@@ -10,6 +13,7 @@ from app.crud import (
     get_user_by_id,
     get_user_by_username,
     get_user_rooms,
+    invalidate_room_tokens,
 )
 from app.dbmodels import Users as UserDB
 from app.exceptions import AuthenticationError, NotFoundError
@@ -19,30 +23,30 @@ from app.schemas import Result, RoomsList, User, UserCreate
 async def create_user(
     username: str,
     password: str,
-    db: Session,
+    db: DBSession,
     auth: Authenticator,
 ) -> Result:
     """:returns: UserPublic model containing username and empty list of rooms"""
-    new_user = UserCreate(username=username, password=auth.hash_password(password))
     try:
-        if get_user_by_username(db, new_user.username):
+        if await get_user_by_username(db, username):
             return Result(success=False, detail="username already exists")
     except NotFoundError:
         pass
+    new_user = UserCreate(username=username, password=await auth.hash_password(password))
 
     data = UserDB(**new_user.model_dump(), rooms=[])
-    result = create_db(db, data)
+    result = await create_db(db, data)
     return result
 
 
 async def login(
     form_data: OAuth2PasswordRequestForm,
     auth: Authenticator,
-    db: Session,
+    db: DBSession,
 ) -> Result:
     """:returns: access token string"""
     input = User(username=form_data.username, password=form_data.password)
-    user = auth.authenticate_user(db=db, input=input)
+    user = await auth.authenticate_user(db=db, input=input)
     access_token = auth.create_access_token(user.id)
     result = Result(detail="successfully created token", data=access_token)
     return result
@@ -51,12 +55,15 @@ async def login(
 async def get_user_home(
     user_id: UUID,
     username: str,
-    db: Session,
+    db: DBSession,
 ) -> RoomsList:
-    user = get_user_by_id(db, user_id)
-    if username != user.username:  # in case token doesn't match username url
+    known = username_cache.get(user_id)
+    if known is None:
+        known = (await get_user_by_id(db, user_id)).username
+        username_cache.put(user_id, known, expires_at=time.time() + settings.USERNAME_CACHE_TTL)
+    if username != known:  # in case token doesn't match username url
         raise AuthenticationError
-    rooms = get_user_rooms(db, user.id)
+    rooms = await get_user_rooms(db, user_id)
     return rooms
 
 
@@ -64,10 +71,13 @@ async def delete_user(
     user_id: UUID,
     auth: Authenticator,
     password: str,
-    db: Session,
+    db: DBSession,
 ) -> Result:
-    user = get_user_by_id(db, user_id)
-    if not auth.verify_password(password, user.password):
+    user = await get_user_by_id(db, user_id)
+    if not await auth.verify_password(password, user.password):
         raise AuthenticationError(detail="wrong password")
-    result = delete_db(db, user.id)
+    await invalidate_room_tokens(db, user_id=user.id)
+    result = await delete_db(db, user.id)
+    if result.success:
+        username_cache.pop(user.id)
     return result
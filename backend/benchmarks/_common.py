@@ -0,0 +1,139 @@
+"""Shared helpers for the HTTP benchmarks
+
+Benchmarks start their own uvicorn worker against the database configured in `.env`,
+so point that at a throwaway Postgres before running them."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_APP = "app.main:app"
+
+
+@contextmanager
+def serve(
+    env: dict[str, str] | None = None,
+    port: int = 8001,
+    app: str = DEFAULT_APP,
+    workers: int = 1,
+) -> Generator[str]:
+    """Run uvicorn for the duration of the block
+    :returns: base URL of the server"""
+    options = ["--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, *options],
+        cwd=BACKEND_DIR,
+        # every request comes from 127.0.0.1, per-IP rate limits would throttle the benchmark
+        env={**os.environ, "RATE_LIMITS_ENABLED": "false", **(env or {})},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> float:
+    """Poll /health until the server answers
+    :returns: seconds waited"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"server at {base_url} did not become ready")
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict[str, str]:
+    """Create the user if needed and log in
+    :returns: Authorization header"""
+    await client.post("/user/create", data={"username": username, "password": password})
+    res = await client.post("/token", data={"username": username, "password": password})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+async def seed_room(
+    client: httpx.AsyncClient,
+    headers: dict[str, str],
+    items: int,
+    body_size: int = 200,
+    room_pw: str = "1234",
+) -> str:
+    """Create a room holding `items` notes of roughly `body_size` characters
+    :returns: room ID"""
+    room_id = (await client.get("/room_id")).json()["id"]
+    res = await client.post(
+        "/room/create",
+        data={"room_id": room_id, "room_name": "bench", "room_pw": room_pw},
+        headers=headers,
+    )
+    res.raise_for_status()
+    for i in range(items):
+        body = {"title": f"note {i}", "content_json": [{"insert": "x" * body_size + "\n"}]}
+        res = await client.post(f"/room/{room_id}/item/create", json=body, headers=headers)
+        res.raise_for_status()
+    return room_id
+
+
+@dataclass
+class LoadResult:
+    seconds: float
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def drive(
+    request: Callable[[], Awaitable[httpx.Response]],
+    duration: float,
+    concurrency: int,
+) -> LoadResult:
+    """Call `request` from `concurrency` tasks until `duration` seconds have passed"""
+    result = LoadResult(seconds=duration)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                res = await request()
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                result.latencies.append(time.perf_counter() - start)
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - start
+    return result
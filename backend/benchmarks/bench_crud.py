@@ -0,0 +1,344 @@
+"""Per-call time and memory of the crud functions, the schema conversions around them
+and the auth helpers, at several data sizes. Runs in process against a throwaway database
+
+By default a fresh database is created next to the one in `.env` and dropped afterwards,
+so the configured user needs CREATEDB. `--url` points at an existing database instead.
+Allocation figures are tracemalloc peaks per call, measured in a separate pass so tracing
+doesn't skew the timings.
+
+    python -m benchmarks.bench_crud --sizes 10 100 1000
+    python -m benchmarks.bench_crud --sizes 100 --only crud.get_all_room_items --async-db
+"""
+
+import argparse
+import asyncio
+import inspect
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Engine, create_engine, insert, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.cache import token_cache
+from app.core.config import settings
+from app.core.db import DBSession, execute
+from app.core.security import Authenticator, decode_token
+from app.dbmodels import Items, Rooms, Users
+from app.dbmodels import room_membership as RoomMem
+from app.migrations import migrate
+from app.schemas import (
+    Item,
+    ItemModifier,
+    ItemOperation,
+    ItemsList,
+    JSONPatchOperation,
+    Room,
+    RoomAccess,
+    RoomsList,
+    UserPrivate,
+)
+
+# an already hashed password keeps Argon2 out of the seeding time
+PASSWORD_HASH = "$argon2id$v=19$m=65536,t=3,p=4$c2VlZHNlZWRzZWVk$" + "A" * 43
+
+
+@dataclass
+class Case:
+    name: str
+    size: int | None
+    call: Callable[[], Any]  # may return an awaitable
+    repeat: int | None = None  # overrides --repeat for slow cases
+
+
+@contextmanager
+def throwaway_engine(url: str | None) -> Generator[Engine]:
+    """:returns: engine on a migrated database, created and dropped around the block
+    unless `url` names an existing one"""
+    if url is not None:
+        engine = create_engine(url)
+        migrate(engine)
+        yield engine
+        engine.dispose()
+        return
+    base = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+    name = f"ournote_bench_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(base.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    engine = create_engine(base.set(database=name))
+    try:
+        migrate(engine)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+def note(i: int, body_size: int) -> dict:
+    body = f"line {i} " + "x" * body_size + "\n"
+    return {"title": f"note {i}", "content_json": [{"insert": body}]}
+
+
+def seed(engine: Engine, size: int, body_size: int) -> dict[str, Any]:
+    """One user in `size` rooms, the first holding `size` items, plus a room for the writes
+    :returns: IDs the cases need"""
+    tag = uuid.uuid4().hex[:6]
+    user_id = uuid.uuid4()
+    room_ids = [f"{tag}{i:02x}"[-8:] for i in range(size)]
+    write_room = f"w{tag}{size % 10}"[-8:]
+    with Session(engine) as session:
+        session.execute(
+            insert(Users), [{"id": user_id, "username": f"b{tag}{size}", "password": PASSWORD_HASH}]
+        )
+        rooms = [{"id": r, "name": f"room {r}", "password": PASSWORD_HASH} for r in room_ids]
+        session.execute(insert(Rooms), [*rooms, {**rooms[0], "id": write_room}])
+        session.execute(insert(RoomMem), [{"user_id": user_id, "room_id": r} for r in room_ids])
+        session.execute(
+            insert(Items), [{**note(i, body_size), "room_id": room_ids[0]} for i in range(size)]
+        )
+        session.execute(insert(Items), [{**note(0, body_size), "room_id": write_room}])
+        session.commit()
+        item_ids = list(
+            session.scalars(select(Items.id).where(Items.room_id == room_ids[0]).order_by(Items.id))
+        )
+        write_item = session.scalars(select(Items.id).where(Items.room_id == write_room)).one()
+    return {
+        "user_id": user_id,
+        "username": f"b{tag}{size}",
+        "room_id": room_ids[0],
+        "item_id": item_ids[len(item_ids) // 2],
+        "write_room": write_room,
+        "write_item": write_item,
+    }
+
+
+def crud_cases(db: DBSession, ids: dict[str, Any], size: int, body_size: int) -> list[Case]:
+    room_id, item_id = ids["room_id"], ids["item_id"]
+    write_room, write_item = ids["write_room"], ids["write_item"]
+    patch = [JSONPatchOperation(op="replace", path="/0/insert", value="patched\n")]
+    batch = [ItemModifier(**note(i, body_size), room_id=write_room) for i in range(size)]
+
+    async def drain_stream():
+        return [item async for item in crud.stream_room_items(db, room_id, batch_size=500)]
+
+    cases = [
+        Case(
+            "crud.get_user_by_username",
+            None,
+            lambda: crud.get_user_by_username(db, ids["username"]),
+        ),
+        Case("crud.get_user_by_id", None, lambda: crud.get_user_by_id(db, ids["user_id"])),
+        Case("crud.get_user_rooms", size, lambda: crud.get_user_rooms(db, ids["user_id"])),
+        Case("crud.get_room", None, lambda: crud.get_room(db, room_id)),
+        Case("crud.get_room_version", None, lambda: crud.get_room_version(db, room_id)),
+        Case("crud.get_all_room_items", size, lambda: crud.get_all_room_items(db, room_id)),
+        Case(
+            "crud.get_all_room_items[summary]",
+            size,
+            lambda: crud.get_all_room_items(db, room_id, fields="summary"),
+        ),
+        Case("crud.stream_room_items", size, drain_stream),
+        Case("crud.get_item", None, lambda: crud.get_item(db, Items(id=item_id, room_id=room_id))),
+        Case("crud.get_item_version", None, lambda: crud.get_item_version(db, room_id, item_id)),
+        Case(
+            "crud.search_items",
+            size,
+            lambda: crud.search_items(db, ids["user_id"], "line", limit=settings.SEARCH_PAGE_SIZE),
+        ),
+        # writes go to their own room so the reads above keep their size
+        Case(
+            "crud.insert_item",
+            None,
+            lambda: crud.insert_item(db, Items(**note(0, body_size), room_id=write_room)),
+        ),
+        Case(
+            "crud.update_item",
+            None,
+            lambda: crud.update_item(
+                db, Items(id=write_item, **note(1, body_size), room_id=write_room)
+            ),
+        ),
+        Case("crud.patch_item", None, lambda: crud.patch_item(db, write_room, write_item, patch)),
+        Case(
+            "crud.apply_item_batch[create]",
+            size,
+            lambda: crud.apply_item_batch(db, write_room, batch, [], []),
+            repeat=3,
+        ),
+    ]
+    return cases
+
+
+async def conversion_cases(
+    db: DBSession, ids: dict[str, Any], size: int, body_size: int
+) -> list[Case]:
+    """The row -> schema -> ORM steps crud and the services do, without the query"""
+    stmt = select(Items.id, Items.title, Items.content_json, Items.version)
+    rows = (await execute(db, stmt.where(Items.room_id == ids["room_id"]))).all()
+    user = (await execute(db, select(Users).where(Users.id == ids["user_id"]))).scalar_one()
+    room_rows = [(f"r{i}", f"room {i}") for i in range(size)]
+    modifiers = [ItemModifier(**note(i, body_size), room_id=ids["room_id"]) for i in range(size)]
+
+    def items_list() -> ItemsList:
+        items = [
+            Item(id=r.id, title=r.title, content_json=r.content_json, version=r.version)
+            for r in rows
+        ]
+        return ItemsList(items=items)
+
+    listing = items_list()
+    return [
+        Case("schema.rows->ItemsList", size, items_list),
+        Case("schema.ItemsList.model_dump", size, listing.model_dump),
+        Case("schema.ItemsList.model_dump_json", size, listing.model_dump_json),
+        Case(
+            "schema.ItemModifier->Items",
+            size,
+            lambda: [Items(**m.model_dump(exclude={"version"})) for m in modifiers],
+        ),
+        Case(
+            "schema.rows->RoomsList",
+            size,
+            lambda: RoomsList(rooms=[Room(id=i, name=n) for i, n in room_rows]),
+        ),
+        Case(
+            "schema.Users->UserPrivate",
+            None,
+            lambda: UserPrivate(id=user.id, username=user.username, password=user.password),
+        ),
+        Case(
+            "schema.ItemOperation batch",
+            size,
+            lambda: [ItemOperation(op="create", **note(i, body_size)) for i in range(size)],
+        ),
+    ]
+
+
+def security_cases(hashing: bool) -> list[Case]:
+    auth = Authenticator()
+    user_id = uuid.uuid4()
+    token = auth.create_access_token(user_id)
+    room = RoomAccess(id="bench", auth_version=3)
+    room_token = auth.create_room_token(user_id, room)
+
+    def decode_cold():
+        token_cache.pop(token)
+        return decode_token(token)
+
+    cases = [
+        Case("security.create_access_token", None, lambda: auth.create_access_token(user_id)),
+        Case("security.decode_token[cold]", None, decode_cold),
+        Case("security.decode_token[cached]", None, lambda: decode_token(token)),
+        Case("security.create_room_token", None, lambda: auth.create_room_token(user_id, room)),
+        Case(
+            "security.verify_room_token",
+            None,
+            lambda: auth.verify_room_token(room_token, user_id, room),
+        ),
+    ]
+    if hashing:
+        hashed: list[str] = []
+
+        async def hash_password():
+            hashed[:] = [await auth.hash_password("bench-password")]
+
+        cases += [
+            Case("security.hash_password", None, hash_password, repeat=5),
+            Case(
+                "security.verify_password",
+                None,
+                lambda: auth.verify_password("bench-password", hashed[0]),
+                repeat=5,
+            ),
+        ]
+    return cases
+
+
+async def call(case: Case) -> Any:
+    result = case.call()
+    return await result if inspect.isawaitable(result) else result
+
+
+async def measure(case: Case, repeat: int) -> tuple[float, float, float]:
+    """:returns: median and best milliseconds, median tracemalloc peak KiB per call"""
+    repeat = case.repeat or repeat
+    await call(case)  # warm up caches, compiled statements and pool connections
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call(case)
+        timings.append(time.perf_counter() - start)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(repeat, 20)):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await call(case)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings) * 1000, min(timings) * 1000, statistics.median(peaks) / 1024
+
+
+async def run(engine: Engine, args: argparse.Namespace):
+    print(f"{'case':<36} {'size':>6} {'median ms':>10} {'best ms':>9} {'peak KiB':>9}")
+
+    async def report(cases: list[Case]):
+        for case in cases:
+            if args.only and not any(case.name.startswith(o) for o in args.only):
+                continue
+            size = "" if case.size is None else case.size
+            # no catch-all: a case that raises is a bug in the function it measures
+            median, best, peak = await measure(case, args.repeat)
+            print(f"{case.name:<36} {size:>6} {median:>10.3f} {best:>9.3f} {peak:>9.1f}")
+
+    await report(security_cases(args.hashing))
+    async_engine = create_async_engine(engine.url) if args.async_db else None
+    for size in args.sizes:
+        ids = seed(engine, size, args.body_size)
+        if async_engine is not None:
+            async with AsyncSession(async_engine, expire_on_commit=False) as db:
+                await report(await conversion_cases(db, ids, size, args.body_size))
+                await report(crud_cases(db, ids, size, args.body_size))
+        else:
+            with Session(engine) as db:
+                await report(await conversion_cases(db, ids, size, args.body_size))
+                await report(crud_cases(db, ids, size, args.body_size))
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--body-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--only", nargs="+", help="case name prefixes to run")
+    parser.add_argument("--async-db", action="store_true", help="use AsyncSession")
+    parser.add_argument(
+        "--no-hashing", dest="hashing", action="store_false", help="skip the Argon2 cases"
+    )
+    parser.add_argument("--url", help="existing throwaway database instead of a new one")
+    args = parser.parse_args()
+    with throwaway_engine(args.url) as engine:
+        asyncio.run(run(engine, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Requests per second of one worker on the sync and the async database path
+
+python -m benchmarks.bench_db_path --duration 10 --concurrency 64
+"""
+
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks._common import DEFAULT_APP, drive, login, seed_room, serve
+
+
+async def measure(base_url: str, args: argparse.Namespace):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        headers = await login(client, "benchuser", "benchpw")
+        room_id = await seed_room(client, headers, items=args.items)
+        return await drive(
+            lambda: client.get(f"/room/{room_id}", headers=headers),
+            duration=args.duration,
+            concurrency=args.concurrency,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--items", type=int, default=20, help="items in the benchmarked room")
+    parser.add_argument("--app", default=DEFAULT_APP)
+    args = parser.parse_args()
+
+    print(f"{'path':<6} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in ("sync", "async"):
+        env = {"DB_ASYNC": "true" if mode == "async" else "false"}
+        with serve(env, app=args.app) as base_url:
+            result = asyncio.run(measure(base_url, args))
+        print(
+            f"{mode:<6} {result.rps:>10.1f} {result.percentile(50) * 1000:>8.2f} "
+            f"{result.percentile(99) * 1000:>8.2f} {result.errors:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""N single item requests vs one bulk request to /room/{room_id}/items
+
+python -m benchmarks.bench_item_batch --sizes 10 100 500
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks._common import DEFAULT_APP, login, seed_room, serve
+
+
+def body(i: int) -> dict:
+    return {"title": f"note {i}", "content_json": [{"insert": f"line {i}\n"}]}
+
+
+async def single_calls(client: httpx.AsyncClient, room_id: str, n: int) -> dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    for i in range(n):
+        (await client.post(f"/room/{room_id}/item/create", json=body(i))).raise_for_status()
+    timings["create"] = time.perf_counter() - start
+    items = (await client.get(f"/room/{room_id}", params={"fields": "summary", "limit": n})).json()
+    ids = [item["id"] for item in items["items"]]
+
+    start = time.perf_counter()
+    for item_id in ids:
+        (await client.put(f"/room/{room_id}/item/{item_id}", json=body(item_id))).raise_for_status()
+    timings["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item_id in ids:
+        (await client.delete(f"/room/{room_id}/item/{item_id}")).raise_for_status()
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def batch_calls(client: httpx.AsyncClient, room_id: str, n: int) -> dict[str, float]:
+    async def send(operations: list[dict]) -> list[dict]:
+        res = await client.post(f"/room/{room_id}/items", json={"operations": operations})
+        res.raise_for_status()
+        return res.json()["results"]
+
+    timings = {}
+    start = time.perf_counter()
+    results = await send([{"op": "create", **body(i)} for i in range(n)])
+    timings["create"] = time.perf_counter() - start
+    ids = [r["id"] for r in results]
+
+    start = time.perf_counter()
+    await send([{"op": "update", "id": item_id, **body(item_id)} for item_id in ids])
+    timings["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await send([{"op": "delete", "id": item_id} for item_id in ids])
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def measure(base_url: str, sizes: list[int]):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        headers = await login(client, "benchuser", "benchpw")
+        client.headers.update(headers)
+        room_id = await seed_room(client, headers, items=0)
+        print(f"{'n':>6} {'op':<7} {'single ms':>10} {'batch ms':>10} {'speedup':>8}")
+        for n in sizes:
+            single = await single_calls(client, room_id, n)
+            batch = await batch_calls(client, room_id, n)
+            for op in ("create", "update", "delete"):
+                print(
+                    f"{n:>6} {op:<7} {single[op] * 1000:>10.1f} {batch[op] * 1000:>10.1f} "
+                    f"{single[op] / batch[op]:>7.1f}x"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--app", default=DEFAULT_APP)
+    args = parser.parse_args()
+    with serve(app=args.app) as base_url:
+        asyncio.run(measure(base_url, args.sizes))
+
+
+if __name__ == "__main__":
+    main()
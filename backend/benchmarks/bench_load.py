@@ -0,0 +1,309 @@
+"""Mixed-workload load test across every router, with per-endpoint throughput and latency.
+
+Seeds `--users` users, each with `--rooms` rooms of `--items` items, then runs
+`--concurrency` virtual users for `--duration` seconds. Each picks the next call from
+WORKLOAD by weight. Needs the Postgres from `docker compose up db` (search, PATCH
+and batch updates use Postgres-only SQL), migrated with `python -m app.migrations`.
+
+    python -m benchmarks.bench_load --duration 30 --save benchmarks/baselines/load.json
+    python -m benchmarks.bench_load --duration 30 --compare benchmarks/baselines/load.json
+
+With --compare the run exits 1 when any endpoint's p95 grows, or its req/s drops,
+by more than --tolerance (fraction) against the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from benchmarks._common import DEFAULT_APP, LoadResult, login, serve
+
+BATCH = 500  # ITEM_BATCH_MAX
+WORDS = ["alpha", "budget", "meeting", "groceries", "travel", "recipe", "deadline", "garden"]
+
+
+@dataclass
+class Member:
+    username: str
+    password: str
+    headers: dict[str, str]
+    rooms: dict[str, list[int]] = field(default_factory=dict)  # room ID -> item IDs
+    room_tokens: dict[str, str] = field(default_factory=dict)
+
+
+def note(i: int, body_size: int) -> dict:
+    words = " ".join(random.choices(WORDS, k=body_size // 8))
+    return {"title": f"note {i} {random.choice(WORDS)}", "content_json": [{"insert": words + "\n"}]}
+
+
+async def seed(client: httpx.AsyncClient, args: argparse.Namespace) -> list[Member]:
+    run = uuid.uuid4().hex[:6]
+    members = []
+    for u in range(args.users):
+        username, password = f"ld{run}{u}", "loadtest-pw"
+        member = Member(username, password, await login(client, username, password))
+        for _ in range(args.rooms):
+            room_id = (await client.get("/room_id")).json()["id"]
+            res = await client.post(
+                "/room/create",
+                data={"room_id": room_id, "room_name": "load", "room_pw": "1234"},
+                headers=member.headers,
+            )
+            res.raise_for_status()
+            item_ids: list[int] = []
+            for start in range(0, args.items, BATCH):
+                ops = [
+                    {"op": "create", **note(i, args.body_size)}
+                    for i in range(start, min(args.items, start + BATCH))
+                ]
+                res = await client.post(f"/room/{room_id}/items", json={"operations": ops})
+                res.raise_for_status()
+                item_ids += [r["id"] for r in res.json()["results"]]
+            member.rooms[room_id] = item_ids
+            res = await client.post(
+                f"/room/{room_id}", data={"room_pw": "1234"}, headers=member.headers
+            )
+            member.room_tokens[room_id] = res.json()["room_token"]
+        members.append(member)
+    return members
+
+
+Call = Callable[[httpx.AsyncClient, Member], Awaitable[httpx.Response]]
+
+
+def _room(member: Member) -> str:
+    return random.choice(list(member.rooms))
+
+
+def _item(member: Member) -> tuple[str, int]:
+    room_id = _room(member)
+    return room_id, random.choice(member.rooms[room_id])
+
+
+async def list_room(client, member):
+    return await client.get(f"/room/{_room(member)}", headers=member.headers)
+
+
+async def list_room_summary(client, member):
+    params = {"fields": "summary"}
+    return await client.get(f"/room/{_room(member)}", params=params, headers=member.headers)
+
+
+async def stream_room(client, member):
+    return await client.get(f"/room/{_room(member)}/stream", headers=member.headers)
+
+
+async def join_room_with_token(client, member):
+    room_id = _room(member)
+    headers = {**member.headers, "X-Room-Token": member.room_tokens[room_id]}
+    return await client.post(f"/room/{room_id}", headers=headers)
+
+
+async def view_item(client, member):
+    room_id, item_id = _item(member)
+    return await client.get(f"/room/{room_id}/item/{item_id}")
+
+
+async def edit_item(client, member):
+    room_id, item_id = _item(member)
+    return await client.put(f"/room/{room_id}/item/{item_id}", json=note(item_id, 200))
+
+
+async def patch_item(client, member):
+    room_id, item_id = _item(member)
+    ops = [{"op": "replace", "path": "/0/insert", "value": f"{random.choice(WORDS)}\n"}]
+    return await client.patch(f"/room/{room_id}/item/{item_id}", json=ops)
+
+
+async def create_item(client, member):
+    room_id = _room(member)
+    return await client.post(f"/room/{room_id}/item/create", json=note(0, 200))
+
+
+async def batch_items(client, member):
+    room_id = _room(member)
+    ops = [{"op": "create", **note(i, 200)} for i in range(10)]
+    res = await client.post(f"/room/{room_id}/items", json={"operations": ops})
+    if res.status_code == 200:
+        member.rooms[room_id] += [r["id"] for r in res.json()["results"] if r["success"]]
+    return res
+
+
+async def search(client, member):
+    params = {"q": random.choice(WORDS)}
+    return await client.get("/search", params=params, headers=member.headers)
+
+
+async def user_home(client, member):
+    return await client.get(f"/user/{member.username}", headers=member.headers)
+
+
+async def generate_room_id(client, member):
+    return await client.get("/room_id")
+
+
+async def token(client, member):
+    data = {"username": member.username, "password": member.password}
+    return await client.post("/token", data=data)
+
+
+async def health(client, member):
+    return await client.get("/health")
+
+
+# (endpoint label, weight, call): weights follow a read-heavy note app
+WORKLOAD: list[tuple[str, int, Call]] = [
+    ("GET /room/{room_id}", 25, list_room),
+    ("GET /room/{room_id}?fields=summary", 15, list_room_summary),
+    ("GET /room/{room_id}/stream", 2, stream_room),
+    ("POST /room/{room_id} (token)", 3, join_room_with_token),
+    ("GET /room/{room_id}/item/{item_id}", 20, view_item),
+    ("PUT /room/{room_id}/item/{item_id}", 8, edit_item),
+    ("PATCH /room/{room_id}/item/{item_id}", 6, patch_item),
+    ("POST /room/{room_id}/item/create", 3, create_item),
+    ("POST /room/{room_id}/items", 2, batch_items),
+    ("GET /search", 6, search),
+    ("GET /user/{username}", 6, user_home),
+    ("GET /room_id", 2, generate_room_id),
+    ("POST /token", 1, token),
+    ("GET /health", 1, health),
+]
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    members: list[Member],
+    duration: float,
+    concurrency: int,
+) -> dict[str, LoadResult]:
+    labels = [label for label, _, _ in WORKLOAD]
+    weights = [weight for _, weight, _ in WORKLOAD]
+    calls = {label: call for label, _, call in WORKLOAD}
+    results = {label: LoadResult(seconds=duration) for label in labels}
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(member: Member):
+        while time.perf_counter() < deadline:
+            label = random.choices(labels, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = (await calls[label](client, member)).status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                results[label].latencies.append(time.perf_counter() - start)
+            else:
+                results[label].errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(members[i % len(members)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for result in results.values():
+        result.seconds = elapsed
+    return results
+
+
+def summarize(results: dict[str, LoadResult]) -> dict[str, dict[str, float]]:
+    return {
+        label: {
+            "requests": r.requests,
+            "errors": r.errors,
+            "rps": round(r.rps, 2),
+            "p50_ms": round(r.percentile(50) * 1000, 3),
+            "p95_ms": round(r.percentile(95) * 1000, 3),
+            "p99_ms": round(r.percentile(99) * 1000, 3),
+        }
+        for label, r in results.items()
+    }
+
+
+def regressions(current: dict, baseline: dict, tolerance: float, min_requests: int) -> list[str]:
+    """Endpoints with too few requests in either run are skipped, their percentiles are noise"""
+    found = []
+    for label, base in baseline["endpoints"].items():
+        now = current["endpoints"].get(label)
+        if now is None or min(now["requests"], base["requests"]) < min_requests:
+            continue
+        if now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{label}: p95 {base['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+        if now["rps"] < base["rps"] * (1 - tolerance):
+            found.append(f"{label}: req/s {base['rps']:.1f} -> {now['rps']:.1f}")
+        if now["errors"] > base["errors"] and now["errors"] > now["requests"] * 0.01:
+            found.append(f"{label}: errors {base['errors']} -> {now['errors']}")
+    return found
+
+
+async def measure(base_url: str, args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        random.seed(args.seed)
+        members = await seed(client, args)
+        if args.warmup:
+            await run_load(client, members, args.warmup, args.concurrency)
+        results = await run_load(client, members, args.duration, args.concurrency)
+    return {
+        "config": {
+            k: getattr(args, k)
+            for k in ("users", "rooms", "items", "body_size", "duration", "concurrency", "workers")
+        },
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "endpoints": summarize(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=2, help="rooms per user")
+    parser.add_argument("--items", type=int, default=200, help="items per room")
+    parser.add_argument("--body-size", type=int, default=400, help="characters per item body")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", type=Path, help="write the results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-requests", type=int, default=50)
+    parser.add_argument("--app", default=DEFAULT_APP)
+    args = parser.parse_args()
+
+    with serve(app=args.app, workers=args.workers) as base_url:
+        report = asyncio.run(measure(base_url, args))
+
+    print(f"{'endpoint':<42} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for label, r in report["endpoints"].items():
+        print(
+            f"{label:<42} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+            f"{r['p99_ms']:>8.2f} {r['errors']:>7}"
+        )
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        found = regressions(report, baseline, args.tolerance, args.min_requests)
+        if found:
+            print(f"\n{len(found)} regression(s) against {args.compare}:")
+            print("\n".join(f"  {line}" for line in found))
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Room ID allocation throughput as the rooms table grows
+
+Inserts up to the largest --sizes rows into `rooms` (marked with name "bench-seed"
+and removed afterwards), then times generate_room_id at each size.
+
+    python -m benchmarks.bench_room_ids --sizes 10000 100000 1000000 --allocations 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete, event, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.db import SessionLocal, engine, init_db
+from app.dbmodels import RoomIDReservations, Rooms
+from app.services.rooms import generate_room_id
+
+SEED_NAME = "bench-seed"
+
+
+def seed_rooms(up_to: int) -> None:
+    """Grow the seeded rows to `up_to` with one INSERT ... SELECT generate_series"""
+    with SessionLocal() as db:
+        have = db.execute(select(func.count()).where(Rooms.name == SEED_NAME)).scalar_one()
+        if have >= up_to:
+            return
+        series = func.generate_series(have + 1, up_to).table_valued("n")
+        rows = select(
+            func.substr(func.md5(text("n::text")), 1, 8),
+            literal(SEED_NAME),
+            literal("x"),
+        ).select_from(series)
+        # a few md5 prefixes collide at this scale; those rows are skipped
+        stmt = insert(Rooms).from_select(["id", "name", "password"], rows)
+        db.execute(stmt.on_conflict_do_nothing())
+        db.commit()
+
+
+def cleanup() -> None:
+    with SessionLocal() as db:
+        db.execute(delete(Rooms).where(Rooms.name == SEED_NAME))
+        db.execute(delete(RoomIDReservations))
+        db.commit()
+
+
+async def allocate(count: int) -> tuple[float, int]:
+    """:returns: seconds taken and statements issued"""
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            for _ in range(count):
+                result = await generate_room_id(db)
+                assert result.success
+            return time.perf_counter() - start, statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--allocations", type=int, default=2000)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'rooms':>10} {'alloc/s':>10} {'queries/alloc':>14}")
+    try:
+        for size in sorted(args.sizes):
+            seed_rooms(size)
+            seconds, statements = asyncio.run(allocate(args.allocations))
+            rate, per_allocation = args.allocations / seconds, statements / args.allocations
+            print(f"{size:>10} {rate:>10.1f} {per_allocation:>14.2f}")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Room listing serialization time and bytes on the wire, default JSON vs orjson,
+uncompressed vs gzip vs brotli. Runs in process, no database needed.
+`model ms` is the response_model validation every such route pays before either encoder runs
+
+    python -m benchmarks.bench_serialization --sizes 10 1000 10000
+"""
+
+import argparse
+import asyncio
+import gzip
+import time
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.config import settings
+from app.schemas import Item, ItemsList
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def room(n: int, body_size: int) -> ItemsList:
+    items = [
+        Item(
+            id=i,
+            title=f"note {i}",
+            content_json=[{"insert": "x" * body_size + "\n", "attributes": {"bold": i % 2 == 0}}],
+            version=1,
+        )
+        for i in range(n)
+    ]
+    return ItemsList(items=items)
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """:returns: best milliseconds of `repeat` runs and the last output"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, out
+
+
+async def timed_async(fn: Callable[[], Awaitable[Any]], repeat: int) -> tuple[float, Any]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = await fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, out
+
+
+async def measure(sizes: list[int], body_size: int, repeat: int):
+    field = create_model_field(name="response", type_=ItemsList, mode="serialization")
+    print(
+        f"{'items':>6} {'model ms':>8} {'encoder':<8} {'ms':>8} {'raw KiB':>9} "
+        f"{'gzip KiB':>9} {'gzip ms':>8} {'br KiB':>8} {'br ms':>7}"
+    )
+    for n in sizes:
+        data = room(n, body_size)
+        # same path the app takes: response_model serialization, then the response class
+        serialize = partial(serialize_response, field=field, response_content=data)
+        model_ms, content = await timed_async(serialize, repeat)
+        for name, cls in (("json", JSONResponse), ("orjson", ORJSONResponse)):
+            ms, response = timed(partial(cls, content), repeat)  # renders the body
+            body = response.body
+            gz_ms, gz = timed(partial(gzip.compress, body, settings.GZIP_LEVEL), repeat)
+            row = f"{n:>6} {model_ms:>8.2f} {name:<8} {ms:>8.2f} {len(body) / 1024:>9.1f} "
+            row += f"{len(gz) / 1024:>9.1f} {gz_ms:>8.2f} "
+            if brotli is not None:
+                compress = partial(brotli.compress, body, quality=settings.BROTLI_QUALITY)
+                br_ms, br = timed(compress, repeat)
+                row += f"{len(br) / 1024:>8.1f} {br_ms:>7.2f}"
+            else:
+                row += f"{'-':>8} {'-':>7}"
+            print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--body-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(measure(args.sizes, args.body_size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
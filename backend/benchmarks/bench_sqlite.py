@@ -0,0 +1,73 @@
+"""Latency of the same requests on the SQLite backend vs Postgres, one worker each.
+Postgres comes from `.env`; SQLite runs on a fresh file in a temporary directory
+
+    python -m benchmarks.bench_sqlite --items 500 --duration 10 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from benchmarks._common import DEFAULT_APP, LoadResult, drive, login, seed_room, serve
+
+BODY = {"title": "edited", "content_json": [{"insert": "edited body\n"}]}
+
+
+async def measure(base_url: str, args: argparse.Namespace) -> dict[str, LoadResult]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        headers = await login(client, "sqlitebench", "sqlitebench-pw")
+        room_id = await seed_room(client, headers, args.items)
+        page = await client.get(f"/room/{room_id}", params={"limit": args.items}, headers=headers)
+        ids = [item["id"] for item in page.json()["items"]]
+
+        requests = {
+            "GET room": lambda: client.get(f"/room/{room_id}", headers=headers),
+            "GET item": lambda: client.get(f"/room/{room_id}/item/{random.choice(ids)}"),
+            "PUT item": lambda: client.put(f"/room/{room_id}/item/{random.choice(ids)}", json=BODY),
+            "PATCH item": lambda: client.patch(
+                f"/room/{room_id}/item/{random.choice(ids)}",
+                json=[{"op": "replace", "path": "/0/insert", "value": "patched\n"}],
+            ),
+            "POST item": lambda: client.post(f"/room/{room_id}/item/create", json=BODY),
+            "GET search": lambda: client.get("/search", params={"q": "edited"}, headers=headers),
+        }
+        return {
+            name: await drive(request, args.duration, args.concurrency)
+            for name, request in requests.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--backends", nargs="+", default=["postgres", "sqlite"])
+    parser.add_argument("--app", default=DEFAULT_APP)
+    args = parser.parse_args()
+
+    print(
+        f"{'backend':<9} {'request':<11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            env = {"DB_BACKEND": backend, "DB_STARTUP": "migrate"}
+            if backend == "sqlite":
+                env["SQLITE_PATH"] = str(Path(tmp) / "bench.db")
+            with serve(env, app=args.app) as base_url:
+                results = asyncio.run(measure(base_url, args))
+            for name, r in results.items():
+                print(
+                    f"{backend:<9} {name:<11} {r.rps:>8.1f} {r.percentile(50) * 1000:>8.2f} "
+                    f"{r.percentile(95) * 1000:>8.2f} {r.percentile(99) * 1000:>8.2f} "
+                    f"{r.errors:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Cold start: time to import the app, and time from process start until /health answers,
+with DB_STARTUP=check and DB_STARTUP=migrate. Migrate the database first
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks._common import BACKEND_DIR, DEFAULT_APP, serve
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def import_seconds(module: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[int, str]]:
+    """:returns: (cumulative microseconds, module) of the slowest imports"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def boot_seconds(app: str, startup: str) -> float:
+    start = time.perf_counter()
+    with serve({"DB_STARTUP": startup}, app=app):
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    parser.add_argument("--app", default=DEFAULT_APP)
+    args = parser.parse_args()
+    module = args.app.partition(":")[0]
+
+    print(f"{'phase':<16} {'median ms':>10} {'min ms':>8}")
+    imports = [import_seconds(module) for _ in range(args.runs)]
+    print(f"{'import':<16} {statistics.median(imports) * 1000:>10.1f} {min(imports) * 1000:>8.1f}")
+    for startup in ("check", "migrate"):
+        boots = [boot_seconds(args.app, startup) for _ in range(args.runs)]
+        print(
+            f"{'boot ' + startup:<16} {statistics.median(boots) * 1000:>10.1f} "
+            f"{min(boots) * 1000:>8.1f}"
+        )
+
+    if args.top:
+        print(f"\n{'cumulative ms':>13}  module")
+        for micros, name in slowest_imports(module, args.top):
+            print(f"{micros / 1000:>13.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def item_id(client: TestClient, room_id: str) -> int:
+    operation = {"op": "create", "title": "note", "content_json": [{"insert": "a"}]}
+    res = client.post(f"/room/{room_id}/items", json={"operations": [operation]})
+    return res.json()["results"][0]["id"]
+
+
+def test_item_etag_answers_conditional_requests(
+    client: TestClient, room_id: str, item_id: int
+) -> None:
+    url = f"/room/{room_id}/item/{item_id}"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    body = {"title": "edited", "content_json": []}
+    res = client.put(url, json=body, headers={"If-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert client.put(url, json=body, headers={"If-Match": etag}).status_code == 412
+    assert client.delete(url, headers={"If-Match": etag}).status_code == 412
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_batch_applies_valid_operations_and_reports_the_rest(
+    client: TestClient, room_id: str, item_id: int
+) -> None:
+    operations = [
+        {"op": "create", "title": "new", "content_json": []},
+        {"op": "update", "id": item_id, "title": "edited", "content_json": []},
+        {"op": "delete", "id": 999_999},
+        {"op": "delete"},
+    ]
+    res = client.post(f"/room/{room_id}/items", json={"operations": operations})
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [(r["op"], r["success"]) for r in results] == [
+        ("create", True),
+        ("update", True),
+        ("delete", False),
+        ("delete", False),
+    ]
+    assert [r["detail"] for r in results[2:]] == ["item doesn't exist", "id is required"]
+    assert client.get(f"/room/{room_id}/item/{item_id}").json()["title"] == "edited"
+    assert client.get(f"/room/{room_id}/item/{results[0]['id']}").json()["title"] == "new"
+
+
+def test_patch_applies_operations_in_order(client: TestClient, room_id: str, item_id: int) -> None:
+    url = f"/room/{room_id}/item/{item_id}"
+    operations = [
+        {"op": "add", "path": "/-", "value": {"insert": "b"}},
+        {"op": "replace", "path": "/1/insert", "value": "c"},
+    ]
+    res = client.patch(url, json=operations, headers={"If-Match": '"1"'})
+    assert res.status_code == 200
+    assert res.json() == {"id": item_id, "version": 2}
+    assert res.headers["ETag"] == '"2"'
+    assert client.get(url).json()["content_json"] == [{"insert": "a"}, {"insert": "c"}]
+
+    assert client.patch(url, json=operations, headers={"If-Match": '"1"'}).status_code == 412
+    assert client.patch(url, json=[{"op": "remove", "path": "/5"}]).status_code == 409
+    assert client.patch(url, json=[{"op": "replace", "path": "/0/insert"}]).status_code == 422
+    assert client.get(url).headers["ETag"] == '"2"'
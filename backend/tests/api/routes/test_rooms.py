@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.admission import TokenBuckets, admission
+from app.core.events import hub
+from app.main import app
+
+
+def test_room_token_requests_skip_password_admission(
+    client: TestClient,
+    user_headers: dict[str, str],
+    room_id: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(admission, "enabled", True)
+    monkeypatch.setitem(admission.buckets, "password", TokenBuckets(rate=0.001, burst=1))
+    res = client.post(f"/room/{room_id}", data={"room_pw": "1234"}, headers=user_headers)
+    token_headers = {**user_headers, "X-Room-Token": res.json()["room_token"]}
+
+    for _ in range(3):
+        assert client.post(f"/room/{room_id}", headers=token_headers).status_code == 200
+    res = client.post(f"/room/{room_id}", data={"room_pw": "1234"}, headers=user_headers)
+    assert res.status_code == 429
+    assert client.delete(f"/room/{room_id}", headers=token_headers).status_code == 200
+
+
+def test_room_token_joins_until_the_member_leaves(
+    client: TestClient, username: str, user_headers: dict[str, str], room_id: str
+) -> None:
+    res = client.post(f"/room/{room_id}", data={"room_pw": "1234"}, headers=user_headers)
+    token_headers = {**user_headers, "X-Room-Token": res.json()["room_token"]}
+    assert client.post(f"/room/{room_id}", headers=token_headers).status_code == 200
+    assert client.post(f"/room/{room_id}", headers=user_headers).status_code == 403
+
+    res = client.request(
+        "DELETE", f"/room/{room_id}/{username}", data={"password": "password"}, headers=user_headers
+    )
+    assert res.status_code == 200
+    assert client.post(f"/room/{room_id}", headers=token_headers).status_code == 403
+
+
+def test_room_etag_answers_if_none_match(
+    client: TestClient, user_headers: dict[str, str], room_id: str
+) -> None:
+    url = f"/room/{room_id}"
+    etag = client.get(url, headers=user_headers).headers["ETag"]
+    assert client.get(url, headers={**user_headers, "If-None-Match": etag}).status_code == 304
+
+    client.post(f"{url}/item/create", json={"title": "note", "content_json": []})
+    res = client.get(url, headers={**user_headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert [item["title"] for item in res.json()["items"]] == ["note"]
+
+
+def test_room_pages_follow_next_cursor(
+    client: TestClient, user_headers: dict[str, str], room_id: str
+) -> None:
+    url = f"/room/{room_id}"
+    operations = [{"op": "create", "title": f"note {i}", "content_json": []} for i in range(5)]
+    client.post(f"{url}/items", json={"operations": operations})
+    whole = client.get(url, headers=user_headers).json()
+    assert len(whole["items"]) == 5
+    assert whole["next_cursor"] is None
+
+    titles, params = [], {"limit": 2}
+    while True:
+        page = client.get(url, params=params, headers=user_headers).json()
+        assert len(page["items"]) <= 2
+        titles += [item["title"] for item in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+    assert titles == [item["title"] for item in whole["items"]]
+
+
+def test_events_stream_unsubscribes_when_the_client_disconnects(
+    client: TestClient, user_headers: dict[str, str], room_id: str
+) -> None:
+    # TestClient buffers whole responses, so the stream is driven over raw ASGI
+    async def read_one_event() -> bytes:
+        disconnected = asyncio.Event()
+        body = bytearray()
+
+        async def receive() -> dict:
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            body.extend(message.get("body", b""))
+            if b"\n\n" in body and b"data:" in body:
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/room/{room_id}/events",
+            "raw_path": f"/room/{room_id}/events".encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"authorization", user_headers["Authorization"].encode())],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+        request = asyncio.create_task(app(scope, receive, send))
+        while not hub.subscribers:
+            await asyncio.sleep(0.01)
+        hub.dispatch({"event": "item.created", "room_id": room_id, "item_ids": [1]})
+        await asyncio.wait_for(request, timeout=5)
+        return bytes(body)
+
+    assert client.portal is not None  # inside the fixture's `with TestClient(...)`
+    body = client.portal.call(read_one_event)
+    assert body.startswith(b"event: item.created\ndata: ")
+    assert hub.subscribers == 0
@@ -1,12 +1,66 @@
+import os
+import uuid
 from collections.abc import Generator
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
+# the app under test creates or upgrades its schema on startup instead of refusing to start
+os.environ["DB_STARTUP"] = "migrate"
+# every test logs in, tests of admission control turn it back on
+os.environ["RATE_LIMITS_ENABLED"] = "false"
+
+from app.core.db import Base
 from app.main import app
 
 
 @pytest.fixture(scope="module")
-def client() -> Generator[TestClient, None, None]:
+def client() -> Generator[TestClient]:
     with TestClient(app) as c:
         yield c
+
+
+@pytest.fixture
+def username(client: TestClient) -> str:
+    """A new user with password 'password'"""
+    username = f"u{uuid.uuid4().hex[:12]}"
+    client.post("/user/create", data={"username": username, "password": "password"})
+    return username
+
+
+@pytest.fixture
+def user_headers(client: TestClient, username: str) -> dict[str, str]:
+    """Bearer header of `username`"""
+    form_data = {"username": username, "password": "password"}
+    token = client.post("/token", data=form_data).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def room_id(client: TestClient, user_headers: dict[str, str]) -> str:
+    """A new room of the `user_headers` user, PIN 1234"""
+    room_id = client.get("/room_id").json()["id"]
+    form_data = {"room_id": room_id, "room_name": "room", "room_pw": "1234"}
+    client.post("/room/create", data=form_data, headers=user_headers)
+    return room_id
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def db(request: pytest.FixtureRequest) -> Generator[Session]:
+    """A session on an empty schema, once per backend.
+    Postgres runs only when TEST_POSTGRES_URI points at a throwaway database"""
+    if request.param == "postgres":
+        uri = os.environ.get("TEST_POSTGRES_URI")
+        if not uri:
+            pytest.skip("TEST_POSTGRES_URI is not set")
+        engine = create_engine(uri)
+    else:
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    Base.metadata.drop_all(engine)
+    engine.dispose()
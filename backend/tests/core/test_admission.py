@@ -0,0 +1,42 @@
+import pytest
+
+from app.core.admission import AdmissionController, TokenBuckets
+from app.exceptions import ServiceUnavailableError, TooManyRequestsError
+
+
+def test_bucket_allows_a_burst_then_waits_for_refill() -> None:
+    buckets = TokenBuckets(rate=0.5, burst=2)
+    buckets.take("ip")
+    assert buckets.wait("ip") == 0
+    buckets.take("ip")
+    assert buckets.wait("ip") == pytest.approx(2, abs=0.01)
+    assert buckets.wait("other") == 0
+
+
+def test_least_recently_used_keys_are_forgotten() -> None:
+    buckets = TokenBuckets(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key)
+    assert len(buckets) == 2
+    assert buckets.wait("a") == 0
+
+
+def test_ip_and_user_are_limited_separately() -> None:
+    controller = AdmissionController({"login": (1, 1)}, max_concurrent=10)
+    controller.check_rate("login", "10.0.0.1", user_id="alice")
+    with pytest.raises(TooManyRequestsError) as e:
+        controller.check_rate("login", "10.0.0.2", user_id="alice")
+    assert e.value.headers == {"Retry-After": "1"}
+    controller.check_rate("login", "10.0.0.2")
+    controller.check_rate("unlimited", "10.0.0.1")
+    assert controller.rejected == {"login:user": 1}
+
+
+def test_concurrency_cap_fails_fast() -> None:
+    controller = AdmissionController({}, max_concurrent=1)
+    controller.enter("login")
+    with pytest.raises(ServiceUnavailableError):
+        controller.enter("login")
+    controller.leave()
+    controller.enter("login")
+    assert controller.in_flight == 1
@@ -0,0 +1,36 @@
+import time
+
+from app.core.cache import ExpiringCache, RoomCache
+from app.schemas import Item
+
+
+def item(id: int) -> Item:
+    return Item(id=id, title="x" * 30, content_json=[])
+
+
+def test_evicts_least_recently_used_over_budget() -> None:
+    cache = RoomCache(max_bytes=200, ttl=60)
+    for i in range(3):
+        cache.put("room", i, value=item(i), generation=cache.generation("room"))
+    assert cache.get("room", 0) is None
+    assert cache.get("room", 2) == item(2)
+    assert cache.size <= 200
+    assert cache.evictions == 1
+
+
+def test_read_racing_a_write_is_not_stored() -> None:
+    cache = RoomCache(max_bytes=1024, ttl=60)
+    generation = cache.generation("room")
+    cache.invalidate("room")  # a write lands while the read is at the DB
+    cache.put("room", 1, value=item(1), generation=generation)
+    assert cache.get("room", 1) is None
+
+
+def test_entries_expire_at_their_own_time() -> None:
+    cache = ExpiringCache(max_entries=2)
+    cache.put("live", 1, expires_at=time.time() + 60)
+    cache.put("expired", 2, expires_at=time.time() - 1)
+    cache.put("newest", 3, expires_at=time.time() + 60)
+    assert cache.get("expired") is None
+    assert cache.get("live") is None  # least recently used, evicted by "newest"
+    assert cache.get("newest") == 3
@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, accepted_encodings
+
+BIG = "note " * 400  # 2000 bytes
+
+
+@pytest.fixture
+def compressed() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/big", response_class=PlainTextResponse)
+    async def big() -> str:
+        return BIG
+
+    @app.get("/small", response_class=PlainTextResponse)
+    async def small() -> str:
+        return "note"
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_accepted_encodings_skip_refused_codings() -> None:
+    assert accepted_encodings("gzip, br;q=0, deflate;q=0.5, x;q=bad") == {"gzip", "deflate"}
+    assert accepted_encodings("") == set()
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli isn't installed")
+@pytest.mark.parametrize(
+    ("accept_encoding", "content_encoding"),
+    [
+        ("gzip, br", "br"),
+        ("br;q=0.1, gzip", "br"),
+        ("gzip, br;q=0", "gzip"),
+        ("deflate", None),
+        ("identity", None),
+    ],
+)
+def test_brotli_is_preferred_over_gzip_over_identity(
+    compressed: TestClient, accept_encoding: str, content_encoding: str | None
+) -> None:
+    res = compressed.get("/big", headers={"Accept-Encoding": accept_encoding})
+    assert res.headers.get("Content-Encoding") == content_encoding
+    assert res.text == BIG
+    if content_encoding is not None:
+        assert "Accept-Encoding" in res.headers["Vary"]
+
+
+def test_gzip_without_brotli(compressed: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(compression, "brotli", None)
+    res = compressed.get("/big", headers={"Accept-Encoding": "br, gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert res.headers["Vary"] == "Accept-Encoding"
+    assert int(res.headers["Content-Length"]) < len(BIG)
+
+
+@pytest.mark.parametrize("accept_encoding", ["br", "gzip"])
+def test_bodies_under_the_minimum_size_are_sent_as_is(
+    compressed: TestClient, accept_encoding: str
+) -> None:
+    if accept_encoding == "br" and compression.brotli is None:
+        pytest.skip("brotli isn't installed")
+    res = compressed.get("/small", headers={"Accept-Encoding": accept_encoding})
+    assert "Content-Encoding" not in res.headers
+    assert res.text == "note"
@@ -0,0 +1,60 @@
+import time
+from pathlib import Path
+from typing import Self
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core import db
+
+
+class Observations:
+    """Stands in for a labelled histogram"""
+
+    def __init__(self) -> None:
+        self.values: list[tuple[tuple[str, ...], float]] = []
+        self._labels: tuple[str, ...] = ()
+
+    def labels(self, *labels: str) -> Self:
+        self._labels = labels
+        return self
+
+    def observe(self, value: float) -> None:
+        self.values.append((self._labels, value))
+
+
+def test_failed_statements_dont_inflate_the_next_latency(monkeypatch: pytest.MonkeyPatch) -> None:
+    latency = Observations()
+    monkeypatch.setattr(db, "DB_QUERY_LATENCY", latency)
+    with create_engine("sqlite://").connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        time.sleep(0.2)
+        assert conn.execute(text("SELECT 1")).scalar_one() == 1
+
+    [(labels, seconds)] = latency.values  # failed statements aren't observed
+    assert labels == ("SELECT", "")
+    assert seconds < 0.1
+
+
+def test_pool_stats_count_checkouts_and_timeouts(tmp_path: Path) -> None:
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=db.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    pool = engine.pool
+    assert isinstance(pool, db.InstrumentedQueuePool)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = pool.stats()
+    engine.dispose()
+
+    assert (stats["checkouts"], stats["timeouts"], stats["in_use"]) == (2, 1, 1)
+    assert stats["max_wait_ms"] >= 100
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core import events
+
+
+@pytest.fixture
+def dispatched(monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    sent: list[dict] = []
+    monkeypatch.setattr(events.hub, "dispatch", sent.append)
+    return sent
+
+
+def test_events_are_dispatched_only_when_the_write_commits(dispatched: list[dict]) -> None:
+    with Session(create_engine("sqlite://")) as session:
+        session.execute(text("SELECT 1"))
+        asyncio.run(events.publish(session, "room0001", "item.created", [1]))
+        assert dispatched == []
+        session.rollback()
+
+        asyncio.run(events.publish(session, "room0001", "item.deleted", [2]))
+        session.commit()
+        session.commit()  # nothing left over for the next transaction
+
+    assert dispatched == [{"event": "item.deleted", "room_id": "room0001", "item_ids": [2]}]
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.core.hasher import HashPool
+from app.exceptions import ServiceUnavailableError
+
+
+def test_hash_and_verify() -> None:
+    pool = HashPool(workers=1)
+
+    async def run():
+        hash = await pool.hash("password")
+        return await pool.verify("password", hash), await pool.verify("wrong", hash)
+
+    assert asyncio.run(run()) == (True, False)
+    assert pool.calls == 3
+    pool.shutdown()
+
+
+def test_full_queue_fails_fast() -> None:
+    pool = HashPool(workers=1, queue_size=0)
+
+    async def run():
+        first = asyncio.create_task(pool.hash("password"))
+        await asyncio.sleep(0)  # let the first call take the only slot
+        with pytest.raises(ServiceUnavailableError) as e:
+            await pool.hash("password")
+        await first
+        return e.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert pool.rejected == 1
+    pool.shutdown()
@@ -0,0 +1,93 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core import logging as app_logging
+from app.core.config import settings
+from app.core.logging import LoggingMiddleware, setup_logging
+
+
+def make_client(sample_rates: dict[str, float] | None = None) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int) -> dict:
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {}
+
+    app.add_middleware(LoggingMiddleware, sample_rates=sample_rates)
+    return TestClient(app)
+
+
+@pytest.fixture
+def access_log(caplog: pytest.LogCaptureFixture) -> pytest.LogCaptureFixture:
+    caplog.set_level(logging.INFO, logger=app_logging.logger.name)
+    return caplog
+
+
+def test_request_id_is_echoed_or_generated(access_log: pytest.LogCaptureFixture) -> None:
+    client = make_client()
+    assert client.get("/items/1", headers={"X-Request-ID": "abc"}).headers["X-Request-ID"] == "abc"
+    generated = client.get("/items/1").headers["X-Request-ID"]
+    assert len(generated) == 32 and generated != "abc"
+    long_id = client.get("/items/1", headers={"X-Request-ID": "x" * 100}).headers["X-Request-ID"]
+    assert long_id == "x" * 64
+
+
+def test_access_record_names_the_route_template(access_log: pytest.LogCaptureFixture) -> None:
+    make_client().get("/items/7")
+    [record] = access_log.records
+    fields = vars(record)
+    assert (fields["path"], fields["route"], fields["status"]) == (
+        "/items/7",
+        "/items/{item_id}",
+        200,
+    )
+
+
+def test_sampled_routes_log_a_fraction_of_successes(
+    access_log: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = make_client({"/items/{item_id}": 0.25})
+    monkeypatch.setattr(app_logging.random, "random", lambda: 0.5)
+    client.get("/items/1")
+    assert access_log.records == []
+
+    client.get("/items/0")  # errors are always logged
+    monkeypatch.setattr(app_logging.random, "random", lambda: 0.1)
+    client.get("/items/1")
+    assert [(vars(r)["status"], vars(r)["sample_rate"]) for r in access_log.records] == [
+        (404, 0.25),
+        (200, 0.25),
+    ]
+
+
+def test_setup_logging_writes_json_from_a_listener_thread(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "LOG_DIR", str(tmp_path / "logs"))
+    app_logger = logging.getLogger("app")
+    monkeypatch.setattr(app_logger, "handlers", app_logger.handlers)
+    monkeypatch.setattr(app_logger, "propagate", app_logger.propagate)
+    level = app_logger.level
+    try:
+        listener = setup_logging()
+        assert [type(h) for h in app_logger.handlers] == [QueueHandler]
+        listener.start()
+        token = app_logging.request_id.set("rid")
+        app_logging.logger.info("request", extra={"status": 200})
+        app_logging.request_id.reset(token)
+        listener.stop()  # drains the queue
+    finally:
+        app_logger.setLevel(level)
+
+    [line] = (tmp_path / "logs" / settings.LOG_FILE).read_text().splitlines()
+    record = json.loads(line)
+    assert record["logger"] == "app.access"
+    assert (record["msg"], record["status"], record["request_id"]) == ("request", 200, "rid")
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import statement_labels
+
+
+def test_statements_are_labelled_by_operation_and_table() -> None:
+    assert statement_labels("INSERT INTO items (title) VALUES (?) RETURNING id") == (
+        "INSERT",
+        "items",
+    )
+    assert statement_labels('UPDATE "rooms" SET room_name=%(name)s') == ("UPDATE", "rooms")
+    assert statement_labels(
+        "\n  select items.id from items join rooms on rooms.id = items.room_id"
+    ) == ("SELECT", "items")
+    assert statement_labels("PRAGMA foreign_keys=ON") == ("PRAGMA", "")
+    assert statement_labels(" ") == ("UNKNOWN", "")
+
+
+def test_metrics_are_labelled_with_the_route_template(client: TestClient, room_id: str) -> None:
+    assert client.get(f"/room/{room_id}/item/999999").status_code == 404
+    text = client.get("/metrics").text
+    template = 'method="GET",route="/room/{room_id}/item/{item_id}"'
+    assert f'http_requests_total{{{template},status="404"}}' in text
+    assert f"http_request_duration_seconds_count{{{template}}}" in text
+    assert room_id not in text
+    assert 'db_query_duration_seconds_count{op="SELECT",table="items"}' in text
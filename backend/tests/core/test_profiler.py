@@ -0,0 +1,45 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.profiler import QueryProfilerMiddleware
+from app.main import app
+
+CREATE = {"op": "create", "title": "note", "content_json": []}
+
+
+@pytest.fixture
+def profiled(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    """The app as it runs with DB_PROFILE on, `client` has already set up its schema"""
+    monkeypatch.setattr(settings, "DB_PROFILE", True)
+    return TestClient(QueryProfilerMiddleware(app, n_plus_one_threshold=3))
+
+
+def test_profiled_responses_report_their_queries(profiled: TestClient, room_id: str) -> None:
+    res = profiled.post(f"/room/{room_id}/items", json={"operations": [CREATE] * 3})
+    assert res.status_code == 200
+    assert int(res.headers["X-DB-Query-Count"]) >= 3
+    assert float(res.headers["X-DB-Time-Ms"]) > 0
+
+
+def test_unprofiled_responses_have_no_query_headers(client: TestClient, room_id: str) -> None:
+    res = client.post(f"/room/{room_id}/items", json={"operations": [CREATE] * 3})
+    assert res.status_code == 200
+    assert "X-DB-Query-Count" not in res.headers
+    assert "X-DB-Time-Ms" not in res.headers
+
+
+def test_repeated_statements_are_reported_as_n_plus_one(
+    profiled: TestClient, room_id: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.WARNING, logger="app.db")
+    profiled.post(f"/room/{room_id}/items", json={"operations": [CREATE] * 3})
+    repeated = {vars(r)["statement"]: vars(r)["times"] for r in caplog.records}
+    assert any(s.startswith("INSERT INTO items") and n == 3 for s, n in repeated.items())
+    assert all(vars(r)["route"] == "/room/{room_id}/items" for r in caplog.records)
+
+    caplog.clear()
+    profiled.post(f"/room/{room_id}/items", json={"operations": [CREATE] * 2})
+    assert caplog.records == []
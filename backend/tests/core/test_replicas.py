@@ -0,0 +1,20 @@
+from app.core.replicas import ReplicaRouter
+
+
+def test_written_room_and_user_read_the_primary() -> None:
+    router = ReplicaRouter(["sqlite://"], sticky=60)
+    router.note_write("room", "abc")
+    router.note_write("user", 1)
+    assert router.route(room_id="abc") is None
+    assert router.route(user_id=1) is None
+    assert router.route(room_id="other", user_id=2) is router.replicas[0]
+
+
+def test_down_or_lagging_replicas_are_skipped() -> None:
+    router = ReplicaRouter(["sqlite://", "sqlite://"], max_lag=2)
+    first, second = router.replicas
+    router.mark_failed(first, RuntimeError("gone"))
+    assert [router.route() for _ in range(3)] == [second] * 3
+    second.lag = 5
+    assert router.route() is None
+    assert ReplicaRouter([]).route() is None
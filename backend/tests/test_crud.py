@@ -0,0 +1,204 @@
+import asyncio
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from psycopg.adapt import PyFormat, Transformer
+from pydantic import ValidationError
+from sqlalchemy import ClauseElement, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.compiler import SQLCompiler
+
+from app.crud import (
+    _apply_patch,
+    _patched_content,
+    _search_statement,
+    create_room_with_member,
+    patch_item,
+    purge_room_id_reservations,
+    reserve_room_id,
+    search_items,
+)
+from app.dbmodels import Items, RoomIDReservations, Rooms, Users
+from app.schemas import JSONPatchOperation, RoomCreate
+
+
+def patch(*operations: dict) -> list[JSONPatchOperation]:
+    return [JSONPatchOperation(**op) for op in operations]
+
+
+def test_apply_patch_matches_jsonb_semantics() -> None:
+    doc = [{"insert": "a", "attributes": {"bold": True}}, {"insert": "b"}]
+    patched = _apply_patch(
+        doc,
+        patch(
+            {"op": "test", "path": "/0/insert", "value": "a"},
+            {"op": "replace", "path": "/0/insert", "value": "A"},
+            {"op": "remove", "path": "/0/attributes/bold"},
+            {"op": "add", "path": "/1", "value": {"insert": "new"}},
+            {"op": "add", "path": "/-", "value": {"insert": "end"}},
+        ),
+    )
+    assert patched == [
+        {"insert": "A", "attributes": {}},
+        {"insert": "new"},
+        {"insert": "b"},
+        {"insert": "end"},
+    ]
+    assert doc[0] == {"insert": "a", "attributes": {"bold": True}}  # input is left alone
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        {"op": "replace", "path": "/5/insert", "value": "x"},
+        {"op": "replace", "path": "/0/missing", "value": "x"},
+        {"op": "remove", "path": "/0/missing"},
+        {"op": "test", "path": "/0/insert", "value": "other"},
+        {"op": "add", "path": "/0/insert/0", "value": "x"},
+        {"op": "add", "path": "/9", "value": "x"},
+    ],
+)
+def test_apply_patch_rejects_patches_that_dont_apply(operation: dict) -> None:
+    with pytest.raises((KeyError, IndexError, TypeError, ValueError)):
+        _apply_patch([{"insert": "a"}], patch(operation))
+
+
+def test_patch_value_is_required_except_for_remove() -> None:
+    with pytest.raises(ValidationError):
+        JSONPatchOperation(op="add", path="/0")
+    assert JSONPatchOperation(op="replace", path="/0", value=None).value is None
+    assert JSONPatchOperation(op="remove", path="/0").value is None
+
+
+DOC = [{"insert": "a", "attributes": {"bold": True}}, {"insert": "b"}]
+
+
+@pytest.mark.parametrize(
+    ("operations", "expected"),
+    [
+        (
+            [
+                {"op": "add", "path": "/1/x", "value": 1},
+                {"op": "replace", "path": "/1/x", "value": 2},
+            ],
+            [DOC[0], {"insert": "b", "x": 2}],
+        ),
+        (
+            [
+                {"op": "remove", "path": "/0/attributes"},
+                {"op": "replace", "path": "/0/attributes", "value": {}},
+            ],
+            None,
+        ),
+        ([{"op": "add", "path": "/9/x", "value": 1}], None),  # missing parent
+        ([{"op": "add", "path": "/1/attributes/bold", "value": True}], None),
+        ([{"op": "add", "path": "/5", "value": {}}], None),  # past the end
+        ([{"op": "replace", "path": "/-1/insert", "value": "x"}], None),
+        ([{"op": "test", "path": "/1/insert", "value": "nope"}], None),
+        (
+            [
+                {"op": "add", "path": "/-", "value": {"insert": "c"}},
+                {"op": "add", "path": "/-", "value": {"insert": "d"}},
+            ],
+            [*DOC, {"insert": "c"}, {"insert": "d"}],
+        ),
+        (
+            [
+                {"op": "test", "path": "/0/insert", "value": "a"},
+                {"op": "replace", "path": "/0/insert", "value": "A"},
+                {"op": "remove", "path": "/0/attributes/bold"},
+                {"op": "add", "path": "/1/0", "value": None},  # "0" is a member name on objects
+            ],
+            [{"insert": "A", "attributes": {}}, {"insert": "b", "0": None}],
+        ),
+    ],
+)
+def test_patch_item_applies_operations_in_order(
+    db: Session, operations: list[dict], expected: list | None
+) -> None:
+    db.add(
+        Rooms(id="patch001", name="room", password="x", items=[Items(title="t", content_json=DOC)])
+    )
+    db.commit()
+    item = db.scalars(select(Items)).one()
+
+    result = asyncio.run(patch_item(db, "patch001", item.id, patch(*operations)))
+    db.expire_all()
+    if expected is None:
+        assert (result.status_code, item.version, item.content_json) == (409, 1, DOC)
+    else:
+        assert result.success and (item.version, item.content_json) == (2, expected)
+
+
+def assert_psycopg_adapts(stmt: ClauseElement) -> None:
+    """What raises "cannot adapt type" when the statement runs, without a server"""
+    dialect = postgresql.psycopg.dialect()
+    compiled = stmt.compile(dialect=dialect)
+    assert isinstance(compiled, SQLCompiler)
+    transformer = Transformer()
+    for bind, name in compiled.bind_names.items():
+        value = compiled.params[name]
+        process = bind.type.dialect_impl(dialect).bind_processor(dialect)
+        transformer.get_dumper(process(value) if process else value, PyFormat.AUTO)
+
+
+def test_patched_content_binds_only_values_psycopg_adapts() -> None:
+    operations = patch(
+        {"op": "add", "path": "/0/x", "value": {"a": [1]}},
+        {"op": "add", "path": "/-", "value": 1},
+        {"op": "test", "path": "/1", "value": "b"},
+    )
+    content, conditions = _patched_content(operations)
+    assert_psycopg_adapts(update(Items).values(content_json=content).where(*conditions))
+
+
+def test_search_statement_binds_only_values_psycopg_adapts() -> None:
+    assert_psycopg_adapts(_search_statement(uuid.uuid4(), "groceries milk", limit=20, offset=40))
+
+
+def test_search_items_finds_words_in_content_json(db: Session) -> None:
+    user = Users(username="searcher", password="x")
+    room = Rooms(id="search01", name="room", password="x", members=[user])
+    room.items = [
+        Items(title="shopping", content_json=[{"insert": "groceries milk\n"}]),
+        Items(title="milk", content_json=[{"insert": "and bread\n"}]),
+        Items(title="other", content_json=[{"insert": "nothing here\n"}]),
+    ]
+    db.add(room)
+    db.commit()
+
+    results = asyncio.run(search_items(db, user.id, "milk", limit=1))
+    assert [hit.title for hit in results.items] == ["milk"]  # title matches rank first
+    assert results.next_offset == 1
+    results = asyncio.run(search_items(db, user.id, "groceries", limit=10))
+    assert [hit.title for hit in results.items] == ["shopping"]
+    assert "<b>groceries</b>" in results.items[0].snippet
+
+
+def test_room_id_reservations_hold_until_they_expire(db: Session) -> None:
+    now = datetime.now(tz=UTC)
+    later, earlier = now + timedelta(minutes=10), now - timedelta(minutes=10)
+    assert asyncio.run(reserve_room_id(db, "live0001", later))
+    assert not asyncio.run(reserve_room_id(db, "live0001", later))
+
+    assert asyncio.run(reserve_room_id(db, "gone0001", earlier))
+    assert asyncio.run(reserve_room_id(db, "gone0002", earlier))
+    assert asyncio.run(reserve_room_id(db, "gone0001", later))  # expired, taken over
+    asyncio.run(purge_room_id_reservations(db, now))
+    assert set(db.scalars(select(RoomIDReservations.id))) == {"live0001", "gone0001"}
+
+
+def test_creating_a_room_consumes_its_reservation(db: Session) -> None:
+    user = Users(username="creator", password="x")
+    db.add(user)
+    db.commit()
+    later = datetime.now(tz=UTC) + timedelta(minutes=10)
+    assert asyncio.run(reserve_room_id(db, "room0001", later))
+
+    room = RoomCreate(id="room0001", name="room", password="x")
+    assert asyncio.run(create_room_with_member(db, room, user.id)).success
+    assert db.scalars(select(RoomIDReservations)).all() == []
+    assert not asyncio.run(reserve_room_id(db, "room0001", later))  # a room holds the ID now
+    assert asyncio.run(create_room_with_member(db, room, user.id)).status_code == 409
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.migrations import SchemaVersionError, check, head, migrate
+
+
+def test_check_reports_an_unmigrated_database(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    with pytest.raises(SchemaVersionError, match="not migrated"):
+        check(engine)
+    migrate(engine)
+    assert check(engine) == head()
+
+
+def test_check_lets_connection_errors_through(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'ournote.db'}")
+    with pytest.raises(OperationalError):
+        check(engine)
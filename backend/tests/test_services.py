@@ -0,0 +1,58 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import room_cache
+from app.core.config import settings
+from app.crud import reserve_room_id
+from app.dbmodels import Items, RoomIDReservations, Rooms
+from app.services import rooms
+from app.services.rooms import generate_room_id, get_room_contents
+
+
+def first_title(db: Session, version: int) -> str:
+    contents = asyncio.run(get_room_contents("cached01", db, version=version))
+    assert contents.items
+    return contents.items[0].title
+
+
+def test_room_contents_cache_follows_the_room_version(db: Session) -> None:
+    room_cache.clear()
+    db.add(
+        Rooms(id="cached01", name="room", password="x", items=[Items(title="old", content_json=[])])
+    )
+    db.commit()
+    assert first_title(db, version=1) == "old"
+
+    # another worker's write: committed, but this worker's cache hasn't been invalidated yet
+    db.execute(update(Items).values(title="new"))
+    db.execute(update(Rooms).values(version=Rooms.version + 1))
+    db.commit()
+    assert first_title(db, version=1) == "old"
+    assert first_title(db, version=2) == "new"
+
+
+def test_generated_room_ids_are_reserved(db: Session) -> None:
+    result = asyncio.run(generate_room_id(db))
+    assert result.success and len(result.data) == 8
+    assert db.scalars(select(RoomIDReservations.id)).all() == [result.data]
+
+
+def test_room_id_generation_gives_up_after_max_attempts(
+    db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    later = datetime.now(tz=UTC) + timedelta(minutes=10)
+    assert asyncio.run(reserve_room_id(db, "taken001", later))
+    drawn: list[str] = []
+
+    def draw_taken(population: str, k: int) -> list[str]:
+        drawn.append("taken001")
+        return list("taken001")
+
+    monkeypatch.setattr(rooms.random, "choices", draw_taken)
+    result = asyncio.run(generate_room_id(db))
+    assert (result.success, result.status_code) == (False, 500)
+    assert len(drawn) == settings.ROOM_ID_MAX_ATTEMPTS